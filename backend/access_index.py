@@ -0,0 +1,272 @@
+"""
+Access Index
+Inverted indexes over extraction output: permission to roles, user to groups and group to roles
+"""
+
+import os
+import json
+import threading
+import logging
+from array import array
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple
+
+from models import PermissionGroup, RolePermissions, compact
+
+logger = logging.getLogger(__name__)
+
+GROUPS_FILENAME = "permission_groups_data.json"
+ROLES_FILENAME = "roles_data.json"
+
+
+class InvalidTenantError(Exception):
+    """Raised when a tenant name does not map to a directory under the index data directory"""
+
+
+class Vocabulary:
+    """Assigns dense integer IDs to names so postings can be stored as arrays of ints"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def add(self, name: str) -> int:
+        term_id = self.ids.get(name)
+        if term_id is None:
+            term_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return term_id
+
+    def get(self, name: str) -> Optional[int]:
+        return self.ids.get(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class Postings:
+    """
+    Inverted map from one kind of term to sorted arrays of another kind's IDs
+    Built from (key, value) pairs, then frozen; lookups never copy
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[int, int]]):
+        grouped: Dict[int, set] = {}
+        for key, value in pairs:
+            grouped.setdefault(key, set()).add(value)
+        self._lists: Dict[int, array] = {key: array('I', sorted(values)) for key, values in grouped.items()}
+
+    def get(self, key: Optional[int]) -> array:
+        return self._lists.get(key, _EMPTY) if key is not None else _EMPTY
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    def size(self) -> int:
+        """Total entries across all postings lists"""
+        return sum(len(values) for values in self._lists.values())
+
+
+_EMPTY = array('I')
+
+
+class AccessIndex:
+    """
+    Read-only indexes answering who has which permission
+    Permissions are indexed by ID and by label. Role grants to groups come from the
+    roles' rules, or from role lists on group details where the tenant returns them.
+    A user's effective permissions are the union, over the user's groups and the roles
+    granted to them, of each role's permission bitset
+    """
+
+    def __init__(self, groups: Dict[str, PermissionGroup], roles: List[Dict[str, Any]]):
+        self.users = Vocabulary()
+        self.groups = Vocabulary()
+        self.roles = Vocabulary()
+        self.permissions = Vocabulary()
+        self.group_names: Dict[int, str] = {}
+        self.role_names: Dict[int, str] = {}
+        self.permission_labels: Dict[int, str] = {}
+
+        user_groups, group_roles, permission_roles = [], [], []
+        # One int per role with a bit set for every permission it grants
+        self._role_permission_bits: Dict[int, int] = {}
+
+        for group_id, group in groups.items():
+            gid = self.groups.add(str(group_id))
+            self.group_names[gid] = group.name or ""
+            for user_id in filter(None, (member.user_id for member in group.members)):
+                user_groups.append((self.users.add(user_id), gid))
+            for role_id in group.granted_role_ids:
+                group_roles.append((gid, self.roles.add(role_id)))
+
+        for role in roles:
+            if not role.get('id'):
+                continue
+            rid = self.roles.add(str(role['id']))
+            self.role_names[rid] = role.get('name', "")
+            permissions = role.get('permissions')
+            if not isinstance(permissions, RolePermissions):
+                continue
+
+            pids = []
+            for _category, permission in permissions.iter_permissions():
+                name = permission.permission_id or permission.label
+                if not name:
+                    continue
+                pid = self.permissions.add(str(name))
+                self.permission_labels.setdefault(pid, permission.label or str(name))
+                permission_roles.append((pid, rid))
+                pids.append(pid)
+            self._role_permission_bits[rid] = bits_from_ids(pids)
+
+            for group_id in permissions.granted_group_ids:
+                group_roles.append((self.groups.add(group_id), rid))
+
+        self._user_groups = Postings(user_groups)
+        self._group_roles = Postings(group_roles)
+        self._permission_roles = Postings(permission_roles)
+        # Labels resolve to every permission ID carrying them
+        self._label_permissions: Dict[str, List[int]] = {}
+        for pid, label in self.permission_labels.items():
+            self._label_permissions.setdefault(label.lower(), []).append(pid)
+
+    @classmethod
+    def from_extraction(cls, groups_data: Dict[str, Any], roles_data: Dict[str, Any]) -> 'AccessIndex':
+        """
+        Build from extract_all_data output and the roles output ({"roles": [...]})
+        Accepts compact records or the plain dicts read back from the output files
+        """
+        groups = {
+            group_id: details if isinstance(details, PermissionGroup) else compact(details, PermissionGroup)
+            for group_id, details in (groups_data.get("group_details") or {}).items()
+        }
+        roles = []
+        for role in roles_data.get("roles") or []:
+            permissions = role.get('permissions')
+            if isinstance(permissions, dict) and permissions:
+                role = {**role, 'permissions': RolePermissions.from_dict(permissions)}
+            roles.append(role)
+        return cls(groups, roles)
+
+    @classmethod
+    def from_directory(cls, directory: str) -> 'AccessIndex':
+        """Build from the permission_groups_data.json and roles_data.json written by a full extraction"""
+        groups_data = _read_json(os.path.join(directory, GROUPS_FILENAME))
+        roles_data = _read_json(os.path.join(directory, ROLES_FILENAME))
+        return cls.from_extraction(groups_data, roles_data)
+
+    def roles_for_permission(self, permission: str) -> List[Dict[str, str]]:
+        """Roles granting a permission, given by ID or (case-insensitively) by label"""
+        role_ids = set()
+        for pid in self._permission_ids(permission):
+            role_ids.update(self._permission_roles.get(pid))
+        return [self._role(rid) for rid in sorted(role_ids)]
+
+    def groups_for_user(self, user_id: str) -> List[Dict[str, str]]:
+        return [self._group(gid) for gid in self._user_groups.get(self.users.get(user_id))]
+
+    def roles_for_group(self, group_id: str) -> List[Dict[str, str]]:
+        return [self._role(rid) for rid in self._group_roles.get(self.groups.get(group_id))]
+
+    def effective_permissions(self, user_id: str) -> List[Dict[str, str]]:
+        """Every permission the user holds through any group and any role granted to it"""
+        bits = 0
+        for gid in self._user_groups.get(self.users.get(user_id)):
+            for rid in self._group_roles.get(gid):
+                bits |= self._role_permission_bits.get(rid, 0)
+        return [self._permission(pid) for pid in iter_bits(bits)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self.users),
+            "groups": len(self.groups),
+            "roles": len(self.roles),
+            "permissions": len(self.permissions),
+            "memberships": self._user_groups.size(),
+            "group_role_grants": self._group_roles.size(),
+            "role_permissions": self._permission_roles.size()
+        }
+
+    def _permission_ids(self, permission: str) -> List[int]:
+        pid = self.permissions.get(permission)
+        if pid is not None:
+            return [pid]
+        return self._label_permissions.get(permission.lower(), [])
+
+    def _group(self, gid: int) -> Dict[str, str]:
+        return {"group_id": self.groups.names[gid], "group_name": self.group_names.get(gid, "")}
+
+    def _role(self, rid: int) -> Dict[str, str]:
+        return {"role_id": self.roles.names[rid], "role_name": self.role_names.get(rid, "")}
+
+    def _permission(self, pid: int) -> Dict[str, str]:
+        return {"permission": self.permissions.names[pid], "label": self.permission_labels.get(pid, "")}
+
+
+class AccessIndexCache:
+    """
+    One AccessIndex per tenant output directory, rebuilt when its extraction files change
+    Tenants are subdirectories of INDEX_DATA_DIR (e.g. the batch runner's per-tenant
+    directories); the empty tenant is INDEX_DATA_DIR itself
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        """Initialize the cache; the data directory defaults to INDEX_DATA_DIR"""
+        self.data_dir = os.path.abspath(data_dir or os.getenv('INDEX_DATA_DIR', '.'))
+        self._entries: Dict[str, Tuple[Tuple[float, float], AccessIndex]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant: str = "") -> AccessIndex:
+        """
+        Return the tenant's index, building it on first use or after the files changed
+        Raises InvalidTenantError for a bad tenant name and FileNotFoundError if it has no extraction output
+        """
+        directory = self._directory(tenant)
+        version = (
+            os.path.getmtime(os.path.join(directory, GROUPS_FILENAME)),
+            os.path.getmtime(os.path.join(directory, ROLES_FILENAME))
+        )
+        with self._lock:
+            entry = self._entries.get(directory)
+            if entry and entry[0] == version:
+                return entry[1]
+
+            index = AccessIndex.from_directory(directory)
+            self._entries[directory] = (version, index)
+            logger.info(f"Built access index for {directory}: {index.stats()}")
+            return index
+
+    def _directory(self, tenant: str) -> str:
+        if not tenant:
+            return self.data_dir
+        if tenant in (".", "..") or os.sep in tenant or (os.altsep and os.altsep in tenant):
+            raise InvalidTenantError(f"Invalid tenant: {tenant}")
+        directory = os.path.join(self.data_dir, tenant)
+        if not os.path.isdir(directory):
+            raise InvalidTenantError(f"Unknown tenant: {tenant}")
+        return directory
+
+
+def bits_from_ids(ids: Iterable[int]) -> int:
+    """Bitset with the given bit positions set, built in one pass instead of one big-int OR per ID"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for term_id in ids:
+        buffer[term_id >> 3] |= 1 << (term_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Positions of the set bits, lowest first; scans the binary digits in C rather than shifting per bit"""
+    digits = bin(bits)[:1:-1]
+    position = digits.find('1')
+    while position != -1:
+        yield position
+        position = digits.find('1', position + 1)
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -3,11 +3,25 @@ FastAPI Service for SuccessFactors Data Extraction
 Provides endpoints to extract permission groups and roles data
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from functools import partial
 import json
+import time
 import logging
+import threading
+from session_pool import SessionPool, SessionLoginError
+from role_snapshots import RoleSnapshotCache, InvalidCursorError
+from extraction_state import ExtractionStateStore
+from jobs import JobManager
+from driver_factory import DriverPool
+from request_governor import governor
+from telemetry import registry, span
+from models import compact_role_permissions, json_default
+from access_index import AccessIndexCache, InvalidTenantError
 from successfactors_scraper import SuccessFactorsScraper
 
 # Configure logging
@@ -16,141 +30,364 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="SuccessFactors Scraper API", version="1.0.0")
 
+# Pre-launched headless browsers that new logins start from
+driver_pool = DriverPool()
+
+# Logged-in sessions shared across requests, keyed by (company_id, username)
+session_pool = SessionPool(scraper_factory=partial(SuccessFactorsScraper, driver_pool=driver_pool))
+
+# Per-tenant role list snapshots that /roles-data pages are served from
+role_snapshots = RoleSnapshotCache()
+
+# Worker pool for long extractions submitted through /jobs
+job_manager = JobManager()
+
+# Inverted indexes over the extraction output files that /index queries are answered from
+access_indexes = AccessIndexCache()
+
 class Credentials(BaseModel):
     username: str
     password: str
     company_name: str  # This maps to company_id
     page: int = 1
     page_size: int = 50
+    cursor: Optional[str] = None  # next_cursor from a previous /roles-data page
+    refresh: bool = False  # discard the cached role snapshot
+    incremental: bool = False  # only fetch groups changed since the last incremental run
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response for payloads holding compact model records, which FastAPI cannot encode itself"""
+    body = json.dumps(content, ensure_ascii=False, default=json_default)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def collect_service_metrics():
+    """Job, pool and request governor state reported on every /metrics scrape"""
+    jobs = job_manager.stats()
+    yield ("sf_jobs", "gauge", "Extraction jobs by status",
+           [({"status": status}, count) for status, count in jobs.items()])
+
+    pool = session_pool.health()
+    in_use = sum(1 for session in pool["sessions"] if session["in_use"])
+    yield ("sf_session_pool_sessions", "gauge", "Logged-in pooled sessions by state",
+           [({"state": "in_use"}, in_use), ({"state": "idle"}, pool["size"] - in_use)])
+    yield ("sf_session_pool_max_sessions", "gauge", "Session pool capacity", [({}, pool["max_size"])])
+
+    browsers = driver_pool.stats()
+    yield ("sf_driver_pool_idle_browsers", "gauge", "Pre-launched browsers ready for a login", [({}, browsers["idle"])])
+    yield ("sf_driver_pool_size", "gauge", "Pre-launched browsers the pool keeps", [({}, browsers["size"])])
+
+    hosts = governor.metrics()["hosts"]
+    yield ("sf_host_request_rate", "gauge", "Current adaptive request rate per SuccessFactors host",
+           [({"host": host}, state["rate"]) for host, state in hosts.items()])
+    yield ("sf_host_circuit_open", "gauge", "1 while a host's circuit breaker is open or half-open",
+           [({"host": host}, 0 if state["circuit"] == "closed" else 1) for host, state in hosts.items()])
+
+registry.register_collector(collect_service_metrics)
+
+def load_access_index(tenant: str):
+    """The tenant's access index, mapping missing or invalid output to HTTP errors"""
+    try:
+        return access_indexes.get(tenant)
+    except InvalidTenantError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No extraction output to index, run a full extraction first")
+    except Exception as e:
+        logger.error(f"Error building access index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def index_response(start: float, **content) -> Dict[str, Any]:
+    return {**content, "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+@app.on_event("startup")
+async def start_session_pool():
+    """Start evicting idle pooled sessions and pre-launching browsers in the background"""
+    session_pool.start_reaper()
+    driver_pool.start()
+
+@app.on_event("shutdown")
+async def close_session_pool():
+    """Finish running jobs, then quit every pooled browser on shutdown"""
+    job_manager.shutdown()
+    session_pool.close_all()
+    driver_pool.close()
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "SuccessFactors Scraper API", "version": "1.0.0"}
 
+@app.get("/health")
+def health(validate: bool = False):
+    """
+    Report session pool occupancy
+    With validate=true, idle sessions are checked against SuccessFactors
+    """
+    return {
+        "status": "ok",
+        "session_pool": session_pool.health(validate=validate),
+        "driver_pool": driver_pool.stats(),
+        "requests": governor.metrics(),
+        "jobs": job_manager.stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Stage and request timings plus job and pool gauges in the Prometheus text format"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/index/roles")
+def index_roles(permission: Optional[str] = None, group: Optional[str] = None, tenant: str = ""):
+    """Roles granting a permission (by ID or label), or roles granted to a group"""
+    if bool(permission) == bool(group):
+        raise HTTPException(status_code=400, detail="Pass exactly one of permission or group")
+    index = load_access_index(tenant)
+    start = time.perf_counter()
+    roles = index.roles_for_permission(permission) if permission else index.roles_for_group(group)
+    return index_response(start, permission=permission, group=group, roles=roles, count=len(roles))
+
+@app.get("/index/groups")
+def index_groups(user: str, tenant: str = ""):
+    """Permission groups a user is a member of"""
+    index = load_access_index(tenant)
+    start = time.perf_counter()
+    groups = index.groups_for_user(user)
+    return index_response(start, user=user, groups=groups, count=len(groups))
+
+@app.get("/index/permissions")
+def index_permissions(user: str, tenant: str = ""):
+    """A user's effective permissions through every group and the roles granted to it"""
+    index = load_access_index(tenant)
+    start = time.perf_counter()
+    permissions = index.effective_permissions(user)
+    return index_response(start, user=user, permissions=permissions, count=len(permissions))
+
+@app.get("/index/stats")
+def index_stats(tenant: str = ""):
+    """Sizes of the tenant's access indexes"""
+    index = load_access_index(tenant)
+    return index.stats()
+
 @app.post("/permission-groups")
-async def get_permission_groups(credentials: Credentials):
+def get_permission_groups(credentials: Credentials):
     """
     Extract permission groups data from SuccessFactors
     """
     try:
         logger.info("Starting permission groups extraction")
 
-        with SuccessFactorsScraper(
+        with session_pool.acquire(
+            company_id=credentials.company_name,
             username=credentials.username,
-            password=credentials.password,
-            company_id=credentials.company_name
-        ) as scraper:
-            # Navigate and login
-            if not scraper.navigate_to_login():
-                raise HTTPException(status_code=400, detail="Failed to navigate to SuccessFactors")
-
-            if not scraper.login():
-                raise HTTPException(status_code=401, detail="Login failed")
-
-            # Extract data
-            extractor = scraper.extract_data()
-            if not extractor:
-                raise HTTPException(status_code=500, detail="Failed to create data extractor")
+            password=credentials.password
+        ) as session:
+            # The pooled extractor already holds the logged-in cookies
+            extractor = session.extractor
 
             # Get permission groups
             groups = extractor.get_permission_groups()
             if not groups:
                 raise HTTPException(status_code=404, detail="No permission groups found")
 
-            # Extract all data
-            all_data = extractor.extract_all_data()
+            # Extract all data, or only the changed groups plus tombstones
+            state_store = ExtractionStateStore(credentials.company_name) if credentials.incremental else None
+            all_data = extractor.extract_all_data(state_store=state_store)
 
             logger.info(f"Successfully extracted {len(groups)} permission groups")
-            return {
+            return json_response({
                 "status": "success",
                 "permission_groups": groups,
                 "complete_data": all_data
-            }
+            })
 
     except HTTPException:
         raise
+    except SessionLoginError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error extracting permission groups: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/permission-groups/stream")
+def stream_permission_groups(credentials: Credentials):
+    """
+    Stream permission groups as NDJSON: an overview line, one line per group as
+    soon as its details and members are fetched, then a summary line
+    """
+    logger.info("Starting streamed permission groups extraction")
+
+    # Log in before the response starts so failures still map to an HTTP status
+    session_context = session_pool.acquire(
+        company_id=credentials.company_name,
+        username=credentials.username,
+        password=credentials.password
+    )
+    try:
+        session = session_context.__enter__()
+    except SessionLoginError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    release_lock = threading.Lock()
+    released = []
+
+    def release():
+        """Return the session to the pool, once, from whichever of the stream or the response ends first"""
+        with release_lock:
+            if released:
+                return
+            released.append(True)
+        session_context.__exit__(None, None, None)
+
+    def records():
+        try:
+            for record in session.extractor.iter_group_records():
+                with span("serialization"):
+                    line = json.dumps(record, ensure_ascii=False, default=json_default) + "\n"
+                yield line
+        except Exception as e:
+            logger.error(f"Error streaming permission groups: {str(e)}")
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+        finally:
+            release()
+
+    # The generator's finally never runs if the response fails before iterating it,
+    # so the response's background task releases the session as well
+    return StreamingResponse(records(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+@app.post("/jobs/permission-groups", status_code=202)
+async def submit_permission_groups_job(credentials: Credentials):
+    """
+    Queue a full permission groups extraction and return its job id immediately
+    Poll GET /jobs/{job_id} for progress and the result
+    """
+    def run(job):
+        with session_pool.acquire(
+            company_id=credentials.company_name,
+            username=credentials.username,
+            password=credentials.password
+        ) as session:
+            state_store = ExtractionStateStore(credentials.company_name) if credentials.incremental else None
+            result = session.extractor.extract_all_data(
+                state_store=state_store,
+                progress_callback=job.update_progress
+            )
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            return result
+
+    job = job_manager.submit("permission-groups", run)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, include_result: bool = True):
+    """Return a job's status and progress, plus its result once it has succeeded"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json_response(job.to_dict(include_result=include_result))
+
 @app.post("/roles-data")
-async def get_roles_data(credentials: Credentials):
+def get_roles_data(credentials: Credentials):
     """
     Extract roles data with permissions from SuccessFactors
-    Supports pagination with page and page_size parameters
+    Supports pagination with page and page_size parameters, or with the
+    next_cursor of a previous page. Pages are served from a cached role list
+    snapshot, so only the requested page's permissions are fetched
     """
     try:
         logger.info(f"Starting roles data extraction (page {credentials.page}, size {credentials.page_size})")
 
-        with SuccessFactorsScraper(
+        key = (credentials.company_name, credentials.username)
+        offset = (credentials.page - 1) * credentials.page_size
+        cursor_etag = None
+
+        if credentials.refresh:
+            role_snapshots.invalidate(key)
+
+        if credentials.cursor:
+            try:
+                cursor_etag, offset = role_snapshots.decode_cursor(credentials.cursor)
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        with session_pool.acquire(
+            company_id=credentials.company_name,
             username=credentials.username,
-            password=credentials.password,
-            company_id=credentials.company_name
-        ) as scraper:
-            # Navigate and login
-            if not scraper.navigate_to_login():
-                raise HTTPException(status_code=400, detail="Failed to navigate to SuccessFactors")
+            password=credentials.password
+        ) as session:
+            scraper = session.scraper
 
-            if not scraper.login():
-                raise HTTPException(status_code=401, detail="Login failed")
+            # Requests for the same tenant are serialized by the session, so check the cache here
+            snapshot = role_snapshots.get(key)
+            if cursor_etag and (snapshot is None or snapshot.etag != cursor_etag):
+                raise HTTPException(status_code=409, detail="Role snapshot changed or expired, restart paging")
 
-            # Extract roles data
-            all_roles_data = scraper.extract_roles_data()
-            if not all_roles_data:
-                raise HTTPException(status_code=404, detail="No roles data found")
+            if snapshot is None:
+                # Extract roles data
+                if session.extractor.roles_source == "odata":
+                    all_roles_data = session.extractor.list_roles()
+                else:
+                    all_roles_data = scraper.extract_roles_data()
+                if not all_roles_data:
+                    raise HTTPException(status_code=404, detail="No roles data found")
+                snapshot = role_snapshots.put(key, all_roles_data)
 
             # Apply pagination
-            total_roles = len(all_roles_data)
-            start_idx = (credentials.page - 1) * credentials.page_size
-            end_idx = start_idx + credentials.page_size
-            
-            if start_idx >= total_roles:
-                paginated_roles = []
-            else:
-                paginated_roles = all_roles_data[start_idx:end_idx]
+            total_roles = len(snapshot.roles)
+            paginated_roles = snapshot.page(offset, credentials.page_size)
+            page = offset // credentials.page_size + 1
 
             # Fetch permissions for each role in the paginated results
-            roles_with_permissions = 0
-            for role in paginated_roles:
-                role_id = role.get('id')
-                if role_id:
-                    try:
-                        permissions = scraper.fetch_role_permissions(role_id)
-                        if permissions:
-                            role['permissions'] = permissions
-                            roles_with_permissions += 1
-                        else:
+            if session.extractor.role_permissions_mode == "http":
+                # Replay the pooled cookies over HTTP; the browser is only needed for login
+                roles_with_permissions = session.extractor.attach_role_permissions(paginated_roles)
+            else:
+                roles_with_permissions = 0
+                for role in paginated_roles:
+                    role_id = role.get('id')
+                    if role_id:
+                        try:
+                            permissions = scraper.fetch_role_permissions(role_id)
+                            if permissions:
+                                role['permissions'] = compact_role_permissions(permissions)
+                                roles_with_permissions += 1
+                            else:
+                                role['permissions'] = {}
+                        except Exception as e:
+                            logger.warning(f"Error fetching permissions for role {role_id}: {str(e)}")
                             role['permissions'] = {}
-                    except Exception as e:
-                        logger.warning(f"Error fetching permissions for role {role_id}: {str(e)}")
+                    else:
                         role['permissions'] = {}
-                else:
-                    role['permissions'] = {}
 
             # Calculate pagination metadata
             total_pages = (total_roles + credentials.page_size - 1) // credentials.page_size
-            
-            logger.info(f"Successfully extracted {len(paginated_roles)} roles (page {credentials.page}/{total_pages}) with {roles_with_permissions} having permissions")
-            return {
+            next_offset = offset + credentials.page_size
+            has_next = next_offset < total_roles
+            logger.info(f"Successfully extracted {len(paginated_roles)} roles (page {page}/{total_pages}) with {roles_with_permissions} having permissions")
+            return json_response({
                 "status": "success",
                 "roles": paginated_roles,
                 "pagination": {
-                    "page": credentials.page,
+                    "page": page,
                     "page_size": credentials.page_size,
                     "total_roles": total_roles,
                     "total_pages": total_pages,
-                    "has_next": credentials.page < total_pages,
-                    "has_prev": credentials.page > 1
+                    "has_next": has_next,
+                    "has_prev": offset > 0,
+                    "next_cursor": snapshot.encode_cursor(next_offset) if has_next else None,
+                    "snapshot_etag": snapshot.etag,
+                    "snapshot_expires_in": round(role_snapshots.expires_in(snapshot), 1)
                 },
                 "summary": {
                     "roles_returned": len(paginated_roles),
                     "roles_with_permissions": roles_with_permissions
                 }
-            }
+            }, headers={"ETag": f'"{snapshot.etag}"'})
 
     except HTTPException:
         raise
+    except SessionLoginError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Error extracting roles data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+SuccessFactors Batch Runner
+Runs the login and group/role extraction for many tenants in parallel from a tenant manifest
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import contextlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://salesdemo.successfactors.eu"
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to one host across every worker process
+    Each acquire() reserves the next free slot, rate per second apart, and sleeps until it
+    """
+
+    def __init__(self, manager, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = manager.Value('d', 0.0)
+        self._lock = manager.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the tenant manifest
+    Either a list of tenants or {"defaults": {...}, "tenants": [...]}; each tenant has
+    company_id, username and password or password_env, and optionally base_url and
+    incremental. Defaults apply to every tenant that does not override them
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if isinstance(manifest, list):
+        defaults, tenants = {}, manifest
+    else:
+        defaults, tenants = manifest.get("defaults", {}), manifest.get("tenants", [])
+
+    resolved = []
+    for index, tenant in enumerate(tenants):
+        tenant = {**defaults, **tenant}
+        if not tenant.get("company_id") or not tenant.get("username"):
+            raise ValueError(f"Tenant #{index + 1} needs company_id and username")
+        if tenant.get("password_env"):
+            tenant["password"] = os.getenv(tenant["password_env"], "")
+        tenant.setdefault("base_url", os.getenv('SF_BASE_URL', DEFAULT_BASE_URL))
+        resolved.append(tenant)
+    return resolved
+
+
+def host_of(tenant: Dict[str, Any]) -> str:
+    return urlparse(tenant["base_url"]).netloc
+
+
+def interleave_by_host(tenants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order tenants round-robin across hosts so workers do not all queue on one host's slots"""
+    by_host = OrderedDict()
+    for tenant in tenants:
+        by_host.setdefault(host_of(tenant), []).append(tenant)
+
+    ordered = []
+    while by_host:
+        for host in list(by_host):
+            ordered.append(by_host[host].pop(0))
+            if not by_host[host]:
+                del by_host[host]
+    return ordered
+
+
+def run_tenant(tenant: Dict[str, Any], output_root: str, host_slots, rate_limiter: Optional[HostRateLimiter],
+               fresh_login: bool, resume: bool = False) -> Dict[str, Any]:
+    """
+    Extract one tenant in a worker process
+    Every tenant writes its output, screenshots, extraction state and console log to
+    its own directory, logs in with its own browser and never shares a session
+    """
+    company_id = tenant["company_id"]
+    tenant_key = f"{company_id}_{tenant['username']}"
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in tenant_key)
+    tenant_dir = os.path.join(output_root, safe_name)
+    os.makedirs(tenant_dir, exist_ok=True)
+    os.chdir(tenant_dir)
+
+    # Imported here, in the tenant directory, so this tenant's fresh worker process sets up its own
+    # scraper module state and opens successfactors_scraper.log next to the tenant's output
+    import main as cli
+    from successfactors_scraper import SuccessFactorsScraper
+    from extraction_state import ExtractionStateStore
+    from session_store import SessionStore
+
+    result = {"company_id": company_id, "username": tenant["username"], "host": host_of(tenant),
+              "output_dir": tenant_dir, "status": "failed"}
+    if not tenant.get("password"):
+        result["error"] = "No password configured"
+        return result
+
+    with host_slots:
+        start = time.monotonic()
+        scraper = SuccessFactorsScraper(
+            username=tenant["username"],
+            password=tenant["password"],
+            company_id=company_id,
+            base_url=tenant["base_url"]
+        )
+        # Every extractor of this tenant shares the host's request rate
+        scraper.rate_limiter = rate_limiter
+        try:
+            with open("run.log", 'w', encoding='utf-8') as log_file, contextlib.redirect_stdout(log_file):
+                state_store = ExtractionStateStore(company_id, "extraction_state") if tenant.get("incremental") else None
+                session_store = SessionStore()
+                result.update(cli.run(scraper, state_store, session_store,
+                                      fresh_login=fresh_login, resume=resume))
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            scraper.close()
+            result["duration_seconds"] = round(time.monotonic() - start, 1)
+
+    return result
+
+
+def run_batch(tenants: List[Dict[str, Any]], output_root: str, max_parallel: int, per_host: int,
+              host_rate: float, fresh_login: bool = False, resume: bool = False) -> Dict[str, Any]:
+    """Run every tenant across a process pool and return the consolidated summary"""
+    # Workers change into tenant directories, so they need an absolute output path
+    output_root = os.path.abspath(output_root)
+    os.makedirs(output_root, exist_ok=True)
+    start = time.monotonic()
+    results = []
+
+    with multiprocessing.Manager() as manager:
+        hosts = {host_of(tenant) for tenant in tenants}
+        host_slots = {host: manager.BoundedSemaphore(per_host) for host in hosts}
+        rate_limiters = {host: HostRateLimiter(manager, host_rate) if host_rate > 0 else None for host in hosts}
+
+        # One fresh process per tenant: the request governor's counters, rates and circuit breakers,
+        # the telemetry timings and the scraper's log file are module state that would otherwise
+        # carry over into the next tenant run by the same worker
+        with ProcessPoolExecutor(max_workers=max_parallel, mp_context=multiprocessing.get_context("spawn"),
+                                 max_tasks_per_child=1) as executor:
+            futures = {}
+            for tenant in interleave_by_host(tenants):
+                host = host_of(tenant)
+                future = executor.submit(run_tenant, tenant, output_root, host_slots[host],
+                                         rate_limiters[host], fresh_login, resume)
+                futures[future] = tenant
+
+            for future in as_completed(futures):
+                tenant = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker process itself died
+                    result = {"company_id": tenant["company_id"], "username": tenant["username"],
+                              "host": host_of(tenant), "status": "failed", "error": str(e)}
+                results.append(result)
+                print(f"{'✅' if result['status'] == 'success' else '❌'} {result['company_id']}/{result['username']}: "
+                      f"{result['status']} {result.get('error', '')}".rstrip())
+
+    statuses = [result["status"] for result in results]
+    return {
+        "tenants": len(results),
+        "succeeded": statuses.count("success"),
+        "partial": statuses.count("partial"),
+        "failed": statuses.count("failed"),
+        "duration_seconds": round(time.monotonic() - start, 1),
+        "results": sorted(results, key=lambda r: (r["company_id"], r["username"]))
+    }
+
+
+def main():
+    """Run the batch described by a tenant manifest"""
+    parser = argparse.ArgumentParser(description="Extract permission groups and roles for many SuccessFactors tenants")
+    parser.add_argument('manifest', help="JSON tenant manifest")
+    parser.add_argument('--output-dir', default=os.getenv('BATCH_OUTPUT_DIR', 'batch_output'),
+                        help="directory that receives one subdirectory per tenant")
+    parser.add_argument('--max-parallel', type=int, default=int(os.getenv('BATCH_MAX_PARALLEL', '4')),
+                        help="tenants extracted at the same time across all hosts")
+    parser.add_argument('--per-host', type=int, default=int(os.getenv('BATCH_PER_HOST', '2')),
+                        help="tenants extracted at the same time on one SuccessFactors host")
+    parser.add_argument('--host-rate', type=float, default=float(os.getenv('BATCH_HOST_RATE', '0')),
+                        help="max API requests per second to one host across all its tenants; 0 disables")
+    parser.add_argument('--incremental', action='store_true',
+                        help="run every tenant incrementally unless its manifest entry says otherwise")
+    parser.add_argument('--fresh-login', action='store_true',
+                        help="ignore cached sessions and log in through the browser")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue each tenant from the checkpoint journal of its interrupted run")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    try:
+        tenants = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"❌ Invalid manifest: {str(e)}")
+        sys.exit(2)
+
+    if args.incremental:
+        for tenant in tenants:
+            tenant.setdefault("incremental", True)
+
+    print(f"🚀 Extracting {len(tenants)} tenants, {args.max_parallel} at a time ({args.per_host} per host)")
+    summary = run_batch(tenants, args.output_dir, args.max_parallel, args.per_host, args.host_rate,
+                        fresh_login=args.fresh_login, resume=args.resume)
+
+    summary_path = os.path.join(args.output_dir, "batch_summary.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print(f"\n🎊 {summary['succeeded']} succeeded, {summary['partial']} partial, {summary['failed']} failed "
+          f"in {summary['duration_seconds']}s")
+    print(f"💾 Summary saved to: {summary_path}")
+    sys.exit(0 if summary["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
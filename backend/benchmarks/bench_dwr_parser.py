@@ -0,0 +1,122 @@
+"""
+DWR Parser Benchmark
+Compares the line-split + regex parser against dwr_parser on synthetic and recorded DWR responses
+
+Usage: python benchmarks/bench_dwr_parser.py [recorded_response.txt ...]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dwr_parser
+from dwr_parser import parse_dwr_callbacks
+
+_LEGACY_PATTERN = re.compile(
+    r"dwr\.engine\._remoteHandle(Callback|Exception)\('[^']*',\s*'([^']*)',\s*(.+)\);?$"
+)
+
+
+def legacy_parse(response_text: str):
+    """The previous parser: split the decoded text into lines and regex-match each one"""
+    callbacks = {}
+    for line in response_text.strip().split('\n'):
+        match = _LEGACY_PATTERN.match(line)
+        if not match:
+            continue
+        handler, call_id, json_str = match.groups()
+        try:
+            data = json.loads(json_str)
+        except json.JSONDecodeError:
+            callbacks[call_id] = {"error": "Invalid JSON in DWR response", "raw": json_str}
+            continue
+        callbacks[call_id] = {"error": "DWR exception", "raw": data} if handler == "Exception" else data
+    return callbacks
+
+
+def member_payload(count: int) -> dict:
+    return {
+        "attributes": {"groupId": 1234, "totalCount": count},
+        "userList": [
+            {
+                "userId": f"user{i:06d}",
+                "firstName": "Firstname",
+                "lastName": f"Lastname {i}",
+                "email": f"user{i}@example.com",
+                "title": "Senior Specialist, Operations",
+                "department": "Operations",
+                "status": "active"
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def dwr_response(payloads, batch_id: str = "0") -> bytes:
+    lines = ["//#DWR-INSERT", "//#DWR-REPLY"]
+    for call_id, payload in enumerate(payloads):
+        lines.append(
+            f"dwr.engine._remoteHandleCallback('{batch_id}','{call_id}',{json.dumps(payload)});"
+        )
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def synthetic_cases():
+    cases = [(f"members x{n}", dwr_response([member_payload(n)])) for n in (1000, 10000, 50000)]
+    batch = []
+    for i in range(100):
+        batch.append({"groupId": i, "groupName": f"Group {i}", "totalCount": 200})
+        batch.append(member_payload(200))
+    cases.append(("batch 200 calls", dwr_response(batch)))
+    return cases
+
+
+def best_of(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_case(name: str, body: bytes, repeat: int):
+    # The legacy path paid for response.text decoding as well as the parse
+    legacy = best_of(lambda b: legacy_parse(b.decode('utf-8')), body, repeat)
+    fast_bytes = best_of(parse_dwr_callbacks, body, repeat)
+    fast_text = best_of(parse_dwr_callbacks, body.decode('utf-8'), repeat)
+
+    if legacy_parse(body.decode('utf-8')) != parse_dwr_callbacks(body):
+        print(f"  WARNING: parsers disagree on {name}")
+
+    size_kb = len(body) / 1024
+    print(
+        f"{name:<22} {size_kb:>10.0f} KB  legacy {legacy * 1000:>9.2f} ms  "
+        f"bytes {fast_bytes * 1000:>9.2f} ms ({legacy / fast_bytes:>4.1f}x)  "
+        f"str {fast_text * 1000:>9.2f} ms ({legacy / fast_text:>4.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DWR response parser')
+    parser.add_argument('recorded', nargs='*', help='Recorded DWR response bodies to include')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the best time is reported')
+    args = parser.parse_args()
+
+    print(f"JSON backend: {dwr_parser.JSON_BACKEND}")
+    cases = synthetic_cases()
+    for path in args.recorded:
+        with open(path, 'rb') as f:
+            cases.append((os.path.basename(path)[:22], f.read()))
+
+    for name, body in cases:
+        run_case(name, body, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Effective Access Benchmark
+Builds EffectiveAccessEngine over a generated tenant and times the full build, incremental
+group and role updates and queries, checking sampled users against a plain set-based join
+
+Usage: python benchmarks/bench_effective_access.py --users 100000 --groups 5000 --permissions 3000
+"""
+
+import os
+import sys
+import time
+import random
+import resource
+import argparse
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from effective_access import EffectiveAccessEngine
+from models import PermissionGroup, RolePermissions
+
+
+def generate(args) -> Dict[str, Any]:
+    """Groups with member lists and roles with categories and rules, as compact records like the extraction output"""
+    rng = random.Random(args.seed)
+    users = [f"user{index:06d}" for index in range(args.users)]
+    group_ids = [str(100000 + index) for index in range(args.groups)]
+
+    group_details = {}
+    for group_id in group_ids:
+        size = max(1, int(rng.expovariate(1 / args.members)))
+        members = rng.sample(users, min(size, len(users)))
+        group_details[group_id] = PermissionGroup.from_dict({
+            "groupId": int(group_id),
+            "groupName": f"Group {group_id}",
+            "members": {"userList": [{"userId": user_id} for user_id in members], "totalCount": len(members)}
+        })
+
+    roles = []
+    for index in range(args.roles):
+        permissions = rng.sample(range(args.permissions), min(args.role_permissions, args.permissions))
+        roles.append({
+            "id": str(500 + index),
+            "name": f"Role {index}",
+            "permissions": RolePermissions.from_dict({
+                "roleId": 500 + index,
+                "categories": [{"categoryLabel": "Generated", "permissions": [
+                    {"permissionId": f"perm_{permission:05d}", "permissionLabel": f"Permission {permission}"}
+                    for permission in permissions
+                ]}],
+                "rules": [{"ruleId": index, "accessGroups": [
+                    {"groupId": group_id} for group_id in rng.sample(group_ids, min(args.grants, len(group_ids)))
+                ]}]
+            })
+        })
+    return {"group_details": group_details, "roles": roles}
+
+
+def naive_permissions(data: Dict[str, Any], user_id: str) -> set:
+    """Reference join with plain sets, for checking the engine"""
+    groups = {group_id for group_id, details in data["group_details"].items()
+              if any(member["userId"] == user_id for member in details["members"]["userList"])}
+    permissions = set()
+    for role in data["roles"]:
+        rules = role["permissions"]["rules"]
+        if any(str(group["groupId"]) in groups for rule in rules for group in rule["accessGroups"]):
+            for category in role["permissions"]["categories"]:
+                permissions.update(entry["permissionId"] for entry in category["permissions"])
+    return permissions
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process; ru_maxrss is KB on Linux and bytes on macOS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<44} {(time.perf_counter() - start) * 1000:>10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the effective access engine on a generated tenant')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=5000)
+    parser.add_argument('--members', type=int, default=100, help='mean members per group')
+    parser.add_argument('--roles', type=int, default=1000)
+    parser.add_argument('--permissions', type=int, default=3000)
+    parser.add_argument('--role-permissions', type=int, default=150, help='permissions per role')
+    parser.add_argument('--grants', type=int, default=5, help='groups each role is granted to')
+    parser.add_argument('--samples', type=int, default=20, help='users checked against the reference join')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    data = timed("generate tenant", generate, args)
+    engine = EffectiveAccessEngine()
+    timed("build: apply all groups", engine.apply, data["group_details"])
+    changed = timed("build: apply all roles", engine.apply, None, data["roles"])
+    print(f"  {engine.stats()}")
+
+    rng = random.Random(args.seed + 1)
+    sample = rng.sample(changed, min(args.samples, len(changed)))
+    mismatches = [user_id for user_id in sample
+                  if set(engine.effective_permissions(user_id)) != naive_permissions(data, user_id)]
+    print(f"reference check: {len(sample) - len(mismatches)}/{len(sample)} users match")
+
+    # A group some role is granted to, so its member changes matter
+    group_id = str(rng.choice(data["roles"])["permissions"]["rules"][0]["accessGroups"][0]["groupId"])
+    details = data["group_details"][group_id]
+    user_list = details.members
+    joined = [{"userId": f"user{rng.randrange(args.users):06d}"} for _ in range(10)]
+    updated = details.with_item("members", {"userList": [member.to_dict() for member in user_list[5:]] + joined,
+                                            "totalCount": len(user_list)})
+    changed = timed("incremental: one group's members changed", engine.apply, {group_id: updated})
+    print(f"  {len(changed)} users changed")
+
+    role = rng.choice(data["roles"])
+    categories = role["permissions"]["categories"]
+    category = categories[0].to_dict()
+    trimmed = {**role, "permissions": role["permissions"].with_item("categories", [
+        {**category, "permissions": category["permissions"][10:]}
+    ])}
+    changed = timed("incremental: one role lost 10 permissions", engine.apply, None, [trimmed])
+    print(f"  {len(changed)} users changed")
+
+    user_id = sample[0] if sample else "user000000"
+    permission = engine.permissions.names[0]
+    timed("query: effective permissions of one user", engine.effective_permissions, user_id)
+    timed("query: has permission", engine.has_permission, user_id, permission)
+    holders = timed("query: users with a permission", engine.users_with_permission, permission)
+    print(f"  {len(holders)} users hold {permission}")
+    print(f"peak RSS: {peak_rss_mb()} MB")
+    if mismatches:
+        print(f"Mismatched users: {mismatches}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
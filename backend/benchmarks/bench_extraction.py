@@ -0,0 +1,265 @@
+"""
+Extraction Throughput Benchmark
+Runs SuccessFactorsDataExtractor end to end against the mock server and reports
+groups/s, roles/s, per-call p50/p99 latency and peak RSS
+
+Usage: python benchmarks/bench_extraction.py --groups 500 --roles 300 --output results.json
+       python benchmarks/bench_extraction.py --baseline results.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import types
+import logging
+import platform
+import resource
+import argparse
+import threading
+import multiprocessing
+from typing import Dict, List, Any
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dwr_parser
+from data_extractor import SuccessFactorsDataExtractor
+from session_context import SessionContext
+from request_governor import governor
+from mock_sf_server import MOCK_SESSION_ID, MOCK_CSRF_TOKEN, add_dataset_arguments, create_server, tenant_and_behavior
+
+# Throughput metrics where lower is a regression; latency and memory regress upwards
+HIGHER_IS_BETTER = ("groups_per_second", "roles_per_second")
+
+
+class CallTimer:
+    """Records the wall time of every HTTP call the extractor's session makes, by endpoint"""
+
+    def __init__(self, session):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._request = session.request
+        session.request = self._timed_request
+
+    def _timed_request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._request(method, url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.samples.setdefault(f"{method} {endpoint_name(url)}", []).append(elapsed)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": len(samples),
+                    "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                    "p99_ms": round(percentile(samples, 99) * 1000, 2)
+                }
+                for name, samples in sorted(self.samples.items())
+            }
+
+
+def endpoint_name(url: str) -> str:
+    """Last path segment with entity keys and batch sizes folded, e.g. PermissionRoleEntity({id})"""
+    path = urlparse(url).path
+    path = re.sub(r"\([^)]*\)", "({id})", path)
+    path = re.sub(r"Multiple\.\d+\.dwr$", "Multiple.{n}.dwr", path)
+    return path.rsplit("/", 1)[-1] or "service root"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process; ru_maxrss is KB on Linux and bytes on macOS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def serve(args, port_queue):
+    """Mock server process entry point; runs until the benchmark terminates it"""
+    server = create_server(*tenant_and_behavior(args), port=0)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def build_extractor(base_url: str) -> SuccessFactorsDataExtractor:
+    """Extractor wired to the mock session as if it had been captured from a logged-in browser"""
+    scraper = types.SimpleNamespace(driver=None, company_id="BENCH", base_url=base_url, rate_limiter=None)
+    extractor = SuccessFactorsDataExtractor(scraper)
+    extractor.apply_context(SessionContext(
+        page_url=f"{base_url}/sf/admin?bplte_company=BENCH",
+        cookies={"JSESSIONID": MOCK_SESSION_ID},
+        csrf_token=MOCK_CSRF_TOKEN,
+        session_id=MOCK_SESSION_ID
+    ))
+    return extractor
+
+
+def bench_groups(extractor, args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    data = extractor.extract_all_data(max_workers=args.workers, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    if "error" in data:
+        raise RuntimeError(f"Group extraction failed: {data['error']}")
+
+    summary = data["summary"]
+    members = sum(len(details.get("members", {}).get("userList", [])) for details in data["group_details"].values())
+    return {
+        "seconds": round(elapsed, 3),
+        "groups": summary["total_groups"],
+        "members": members,
+        "failures": len(summary["failures"]),
+        "groups_per_second": round(summary["extracted_details"] / elapsed, 1)
+    }
+
+
+def bench_roles(extractor, args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    roles = extractor.list_roles()
+    with_permissions = extractor.attach_role_permissions(roles, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+    if not roles:
+        raise RuntimeError("Role listing failed")
+
+    # Effective access is built from the roles' rules; fetched permissions without them grant nothing
+    granting = sum(1 for role in roles if role['permissions'] and role['permissions'].granted_group_ids)
+    if with_permissions and args.groups and args.grants and not granting:
+        raise RuntimeError("No group to role grants in the fetched role permissions")
+
+    return {
+        "seconds": round(elapsed, 3),
+        "roles": len(roles),
+        "failures": len(roles) - with_permissions,
+        "roles_with_grants": granting,
+        "roles_per_second": round(with_permissions / elapsed, 1)
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change of every headline metric and return the ones that regressed beyond tolerance"""
+    regressions = []
+    current, previous = flatten(results), flatten(baseline)
+    print(f"\nCompared with baseline ({baseline.get('timestamp', 'unknown time')}):")
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = -change if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"  {name:<50} {old:>10} -> {value:>10} ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """Headline metrics keyed as stage.metric or calls.endpoint.metric"""
+    metrics = {"peak_rss_mb": results["peak_rss_mb"]}
+    for stage in ("groups", "roles"):
+        for key in ("groups_per_second", "roles_per_second"):
+            if key in results.get(stage, {}):
+                metrics[f"{stage}.{key}"] = results[stage][key]
+    for endpoint, stats in results.get("calls", {}).items():
+        metrics[f"calls.{endpoint}.p50_ms"] = stats["p50_ms"]
+        metrics[f"calls.{endpoint}.p99_ms"] = stats["p99_ms"]
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark group and role extraction against the mock server')
+    add_dataset_arguments(parser)
+    parser.add_argument('--url', help='benchmark an already running mock server instead of starting one')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('EXTRACTION_MAX_WORKERS', '4')),
+                        help='concurrent calls (EXTRACTION_MAX_WORKERS)')
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('DWR_BATCH_SIZE', '1')),
+                        help='groups per batched DWR request (DWR_BATCH_SIZE)')
+    parser.add_argument('--request-rate', type=float, default=1000.0,
+                        help='request governor rate per second; 0 keeps REQUEST_RATE')
+    parser.add_argument('--stages', default='groups,roles', help='comma separated stages to run')
+    parser.add_argument('--output', help='write the results as JSON for later comparison')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='relative slowdown against the baseline reported as a regression')
+    args = parser.parse_args()
+
+    # Failed calls are counted in the results; their log lines would only flood the console
+    logging.basicConfig(level=logging.CRITICAL)
+
+    if args.request_rate > 0:
+        # Buckets are created on the first request to a host, so this applies to the whole run
+        governor.rate = governor.max_rate = governor.burst = args.request_rate
+
+    server_process = None
+    base_url = args.url
+    if not base_url:
+        port_queue = multiprocessing.Queue()
+        server_process = multiprocessing.Process(target=serve, args=(args, port_queue), daemon=True)
+        server_process.start()
+        base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    results: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "json_backend": dwr_parser.JSON_BACKEND,
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    }
+
+    try:
+        extractor = build_extractor(base_url)
+        timer = CallTimer(extractor.session)
+        print(f"Benchmarking {', '.join(stages)} against {base_url} "
+              f"({args.workers} workers, batch size {args.batch_size})")
+
+        if "groups" in stages:
+            results["groups"] = bench_groups(extractor, args)
+            print(f"groups: {results['groups']['groups']} in {results['groups']['seconds']}s "
+                  f"= {results['groups']['groups_per_second']} groups/s "
+                  f"({results['groups']['members']} members, {results['groups']['failures']} failed calls)")
+        if "roles" in stages:
+            results["roles"] = bench_roles(extractor, args)
+            print(f"roles:  {results['roles']['roles']} in {results['roles']['seconds']}s "
+                  f"= {results['roles']['roles_per_second']} roles/s ({results['roles']['failures']} without permissions, "
+                  f"{results['roles']['roles_with_grants']} granted to groups)")
+
+        results["calls"] = timer.summary()
+        results["peak_rss_mb"] = peak_rss_mb()
+        results["governor"] = governor.metrics()["hosts"]
+    finally:
+        if server_process:
+            server_process.terminate()
+            server_process.join()
+
+    print(f"\n{'endpoint':<52} {'calls':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, stats in results["calls"].items():
+        print(f"{name:<52} {stats['calls']:>7} {stats['p50_ms']:>9} {stats['p99_ms']:>9}")
+    print(f"peak RSS: {results['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Mock SuccessFactors Server
+Local stand-in for the DWR permission group endpoints and the PAP.svc/v1 OData role endpoints,
+with a generated tenant dataset and configurable latency and error rates
+
+Usage: python benchmarks/mock_sf_server.py --port 8900 --groups 500 --members 200 --roles 300
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# Session the benchmark presents; any other cookie is answered with 401
+MOCK_SESSION_ID = "MOCKSESSION0000000000000000000001"
+MOCK_CSRF_TOKEN = "mock-csrf-token-0000000000000001"
+
+DWR_PATH = "/xi/ajax/remoting/call/plaincall/"
+ODATA_PATH = "/odatav4/iam/authorization/PAP.svc/v1/"
+
+_ENTITY_KEY = re.compile(r"^PermissionRoleEntity\((\d+)L?\)$")
+
+# Navigation properties of PermissionRoleEntity: only returned when expanded, never affected by $select
+NAVIGATION_PROPERTIES = ("categories", "rules")
+
+DEPARTMENTS = ["Operations", "Finance", "Sales", "Engineering", "Human Resources", "Legal", "Marketing"]
+TITLES = ["Specialist", "Senior Specialist", "Manager", "Director", "Analyst", "Consultant"]
+CATEGORY_LABELS = [
+    "Employee Data", "Employee Central Effective Dated Entities", "Manage Compensation",
+    "Manage Permission Roles", "Manage User", "Reports Permission", "Succession Planners",
+    "Goal Plan Permissions", "Learning Access", "Metadata Framework", "Homepage v3 Tiles"
+]
+PERMISSION_VERBS = ["View", "Edit", "Create", "Delete", "Correct", "Import", "Export", "Approve"]
+PERMISSION_OBJECTS = [
+    "Personal Information", "Job Information", "Compensation Information", "Address", "Email Information",
+    "Phone Information", "Employment Details", "Position", "Cost Center", "Department", "Division",
+    "Legal Entity", "Pay Component", "Work Schedule", "Time Account", "Dependents", "Emergency Contact"
+]
+
+
+class MockTenant:
+    """
+    Deterministic generated tenant: permission groups with members drawn from a user
+    pool, and roles whose categories hold permissions from a shared vocabulary
+    Member lists and role entities are generated on first use and then cached
+    """
+
+    def __init__(self, groups: int = 200, members: int = 100, users: int = 5000, roles: int = 100,
+                 categories: int = 6, permissions: int = 20, grants: int = 3, seed: int = 42):
+        self.group_count = groups
+        self.members_per_group = members
+        self.user_count = max(users, 1)
+        self.role_count = roles
+        self.categories_per_role = categories
+        self.permissions_per_category = permissions
+        self.grants_per_role = grants
+        self.seed = seed
+
+        # Group and role IDs are sparse, like real tenants
+        self.group_ids = [1000 + 7 * i for i in range(groups)]
+        self.role_ids = [50 + 3 * i for i in range(roles)]
+        self._group_index = {group_id: i for i, group_id in enumerate(self.group_ids)}
+        self._role_index = {role_id: i for i, role_id in enumerate(self.role_ids)}
+
+    def group_list(self) -> Dict[str, Any]:
+        """getStickyGroupData payload"""
+        return {
+            "groupList": [self._group_summary(group_id) for group_id in self.group_ids],
+            "totalCount": self.group_count
+        }
+
+    def group_details(self, group_id: int) -> Optional[Dict[str, Any]]:
+        """retrieveGroup payload, or None for an unknown group"""
+        if group_id not in self._group_index:
+            return None
+        rng = self._rng("details", group_id)
+        details = self._group_summary(group_id)
+        details.update({
+            "groupType": "permission",
+            "activeMembershipCount": len(self._members(group_id)),
+            "dynamicGroup": True,
+            "peopleCriteria": [
+                {
+                    "field": rng.choice(["department", "division", "location", "jobCode"]),
+                    "operator": "equals",
+                    "values": rng.sample(DEPARTMENTS, 2)
+                }
+                for _ in range(rng.randint(1, 3))
+            ],
+            "excludeCriteria": [],
+            "createdBy": "admin",
+            "lastModifiedBy": "admin"
+        })
+        return details
+
+    def group_members(self, group_id: int, start: int, max_results: int) -> Optional[Dict[str, Any]]:
+        """One getGroupMembers page, or None for an unknown group"""
+        if group_id not in self._group_index:
+            return None
+        members = self._members(group_id)
+        return {
+            "attributes": {"groupId": group_id},
+            "userList": [self._user(user_index) for user_index in members[start:start + max_results]],
+            "totalCount": len(members)
+        }
+
+    def role_entity(self, role_id: int, expand: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        PermissionRoleEntity with the navigation properties named in expand (see parse_expand):
+        categories with their permissions, and grant rules with their access groups if nested-expanded
+        """
+        if role_id not in self._role_index:
+            return None
+        index = self._role_index[role_id]
+        entity = {
+            "roleId": role_id,
+            "roleName": f"Role {index:04d} - {CATEGORY_LABELS[index % len(CATEGORY_LABELS)]}",
+            "userType": "EMPLOYEE" if index % 5 else "EXTERNAL",
+            "roleDesc": f"Generated role {index}",
+            "status": "ACTIVE",
+            "rbpOnly": index % 3 == 0,
+            "lastModifiedDate": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T08:00:00Z"
+        }
+        if "categories" in expand:
+            entity["categories"] = self._categories(role_id)
+        if "rules" in expand:
+            entity["rules"] = self._rules(role_id, parse_expand(expand["rules"]))
+        return entity
+
+    def role_page(self, skip: int, top: int, expand: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [self.role_entity(role_id, expand) for role_id in self.role_ids[skip:skip + top]]
+
+    def _group_summary(self, group_id: int) -> Dict[str, Any]:
+        index = self._group_index[group_id]
+        return {
+            "groupId": group_id,
+            "groupName": f"Group {index:05d} {DEPARTMENTS[index % len(DEPARTMENTS)]}",
+            "userType": "EMPLOYEE",
+            "totalMemberCount": len(self._members(group_id)),
+            "lastModified": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T08:00:00Z"
+        }
+
+    @lru_cache(maxsize=None)
+    def _members(self, group_id: int) -> Tuple[int, ...]:
+        """User indexes of the group; sizes vary around the configured average"""
+        rng = self._rng("members", group_id)
+        size = min(self.user_count, max(0, int(rng.expovariate(1 / self.members_per_group))))
+        return tuple(sorted(rng.sample(range(self.user_count), size)))
+
+    def _user(self, user_index: int) -> Dict[str, Any]:
+        return {
+            "userId": f"user{user_index:06d}",
+            "userName": f"user{user_index:06d}",
+            "firstName": "Firstname",
+            "lastName": f"Lastname {user_index}",
+            "email": f"user{user_index}@example.com",
+            "title": TITLES[user_index % len(TITLES)],
+            "department": DEPARTMENTS[user_index % len(DEPARTMENTS)],
+            "status": "active"
+        }
+
+    @lru_cache(maxsize=None)
+    def _categories_json(self, role_id: int) -> str:
+        rng = self._rng("categories", role_id)
+        categories = []
+        for label in rng.sample(CATEGORY_LABELS, min(self.categories_per_role, len(CATEGORY_LABELS))):
+            permissions = []
+            for _ in range(self.permissions_per_category):
+                verb, obj = rng.choice(PERMISSION_VERBS), rng.choice(PERMISSION_OBJECTS)
+                permissions.append({
+                    "permissionId": f"{label}:{verb} {obj}".replace(" ", "_").lower(),
+                    "permissionLabel": f"{verb} {obj}",
+                    "permissionType": label,
+                    "checked": True
+                })
+            categories.append({"categoryId": label.replace(" ", "_").lower(), "categoryLabel": label,
+                               "permissions": permissions})
+        return json.dumps(categories)
+
+    def _categories(self, role_id: int) -> List[Dict[str, Any]]:
+        return json.loads(self._categories_json(role_id))
+
+    def _rules(self, role_id: int, expand: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Grants of the role to a few permission groups; a rule's groups are navigation properties too"""
+        if not self.group_ids:
+            return []
+        rule = {"ruleId": role_id * 100 + 1}
+        if "accessGroups" in expand:
+            rng = self._rng("rules", role_id)
+            granted = rng.sample(self.group_ids, min(self.grants_per_role, len(self.group_ids)))
+            rule["accessGroups"] = [{"groupId": group_id, "groupName": self._group_summary(group_id)["groupName"]}
+                                    for group_id in granted]
+        if "targetGroups" in expand:
+            rule["targetGroups"] = [{"groupId": "everyone", "groupName": "Everyone"}]
+        return [rule]
+
+    def _rng(self, kind: str, entity_id: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{entity_id}")
+
+
+class MockBehavior:
+    """Latency and failure injection applied to every request"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, csrf_expiry: float = 0.0, seed: int = 42):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        # Seconds after which the CSRF token expires and must be re-fetched; 0 never expires
+        self.csrf_expiry = csrf_expiry
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._csrf_token = MOCK_CSRF_TOKEN
+        self._csrf_issued = time.monotonic()
+
+    def delay(self):
+        with self._lock:
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def injected_failure(self) -> Optional[int]:
+        """HTTP status to answer with instead of the real response, if any"""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def csrf_valid(self, token: Optional[str]) -> bool:
+        with self._lock:
+            if self.csrf_expiry and time.monotonic() - self._csrf_issued > self.csrf_expiry:
+                self._csrf_token = f"mock-csrf-token-{int(time.time() * 1000)}"
+                self._csrf_issued = time.monotonic()
+            return token == self._csrf_token
+
+    def issue_csrf_token(self) -> str:
+        with self._lock:
+            return self._csrf_token
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Serves the DWR and OData endpoints used by SuccessFactorsDataExtractor"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle on, keep-alive replies stall on delayed ACKs
+    disable_nagle_algorithm = True
+    tenant: MockTenant
+    behavior: MockBehavior
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        if not self._admit():
+            return
+        path = urlparse(self.path).path
+        if not path.startswith(DWR_PATH) or not path.endswith(".dwr"):
+            self._send(404, b"Not found", "text/plain")
+            return
+        self._send(200, self._dwr_reply(body), "text/javascript")
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        url = urlparse(self.path)
+        if not url.path.startswith(ODATA_PATH):
+            self._send(404, b"Not found", "text/plain")
+            return
+
+        resource = url.path[len(ODATA_PATH):]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        expand = parse_expand(query.get("$expand", ""))
+
+        if resource == "":
+            headers = {}
+            if self.headers.get("x-csrf-token", "").lower() == "fetch":
+                headers["x-csrf-token"] = self.behavior.issue_csrf_token()
+            self._send_json(200, {"value": [{"name": "PermissionRoleEntity", "url": "PermissionRoleEntity"}]}, headers)
+        elif resource == "PermissionRoleEntity":
+            skip, top = int(query.get("$skip", 0)), int(query.get("$top", self.tenant.role_count))
+            entities = self.tenant.role_page(skip, top, expand)
+            try:
+                self._send_json(200, {"value": [_select(entity, query.get("$select")) for entity in entities]})
+            except KeyError as e:
+                self._send_json(400, {"error": {"code": "400", "message": f"Could not find a property named {e}"}})
+        elif _ENTITY_KEY.match(resource):
+            entity = self.tenant.role_entity(int(_ENTITY_KEY.match(resource).group(1)), expand)
+            if entity is None:
+                self._send_json(404, {"error": {"code": "404", "message": "Role not found"}})
+                return
+            try:
+                self._send_json(200, _select(entity, query.get("$select")))
+            except KeyError as e:
+                self._send_json(400, {"error": {"code": "400", "message": f"Could not find a property named {e}"}})
+        else:
+            self._send_json(404, {"error": {"code": "404", "message": f"Unknown resource {resource}"}})
+
+    def _admit(self) -> bool:
+        """Apply latency, the session check, CSRF expiry and injected failures; False if already answered"""
+        self.behavior.delay()
+
+        if f"JSESSIONID={MOCK_SESSION_ID}" not in self.headers.get("Cookie", ""):
+            self._send(401, b"Session expired", "text/plain")
+            return False
+
+        token = self.headers.get("x-csrf-token")
+        if self.behavior.csrf_expiry and token and token.lower() != "fetch" and not self.behavior.csrf_valid(token):
+            self._send(403, b"CSRF token validation failed", "text/plain", {"x-csrf-token": "Required"})
+            return False
+
+        status = self.behavior.injected_failure()
+        if status == 429:
+            self._send(429, b"Too many requests", "text/plain", {"Retry-After": "0"})
+            return False
+        if status:
+            self._send(status, b"Internal server error", "text/plain")
+            return False
+        return True
+
+    def _dwr_reply(self, body: str) -> bytes:
+        """Answer every call in a (possibly batched) DWR plaincall body"""
+        fields = dict(line.split("=", 1) for line in body.splitlines() if "=" in line)
+        batch_id = fields.get("batchId", "0")
+        lines = ["//#DWR-INSERT", "//#DWR-REPLY"]
+
+        for call_id in range(int(fields.get("callCount", 1))):
+            method = fields.get(f"c{call_id}-methodName", "")
+            params = []
+            index = 0
+            while f"c{call_id}-param{index}" in fields:
+                params.append(fields[f"c{call_id}-param{index}"].split(":", 1)[-1])
+                index += 1
+
+            payload = self._dwr_call(method, params)
+            if payload is None:
+                error = {"javaClassName": "java.lang.IllegalArgumentException",
+                         "message": f"Cannot handle {method}({', '.join(params)})"}
+                lines.append(f"dwr.engine._remoteHandleException('{batch_id}','{call_id}',{json.dumps(error)});")
+            else:
+                lines.append(f"dwr.engine._remoteHandleCallback('{batch_id}','{call_id}',{json.dumps(payload)});")
+
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def _dwr_call(self, method: str, params: List[str]) -> Optional[Dict[str, Any]]:
+        try:
+            if method == "getStickyGroupData":
+                return self.tenant.group_list()
+            if method == "retrieveGroup":
+                return self.tenant.group_details(int(params[0]))
+            if method == "getGroupMembers":
+                return self.tenant.group_members(int(params[0]), int(params[2]), int(params[3]))
+        except (IndexError, ValueError):
+            pass
+        return None
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the server's CPU time
+        pass
+
+
+def parse_expand(expand: str) -> Dict[str, str]:
+    """
+    Split an $expand option into its navigation properties, each mapped to its nested options,
+    e.g. "categories,rules($expand=accessGroups)" -> {"categories": "", "rules": "accessGroups"}
+    """
+    expanded, depth, start = {}, 0, 0
+    for position, char in enumerate(expand + ","):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            item = expand[start:position].strip()
+            start = position + 1
+            if item:
+                name, _, options = item.partition("(")
+                expanded[name.strip()] = options[:-1].split("$expand=", 1)[-1] if options else ""
+    return expanded
+
+
+def _select(entity: Dict[str, Any], select: Optional[str]) -> Dict[str, Any]:
+    """
+    Apply $select like the real service: only the listed structural properties are returned,
+    expanded navigation properties are kept, and an unknown name raises KeyError (a 400)
+    """
+    if not select:
+        return entity
+    names = [name.strip() for name in select.split(",") if name.strip()]
+    for name in names:
+        if name not in entity and name not in NAVIGATION_PROPERTIES:
+            raise KeyError(name)
+    return {key: value for key, value in entity.items() if key in names or key in NAVIGATION_PROPERTIES}
+
+
+def create_server(tenant: MockTenant, behavior: MockBehavior, host: str = "127.0.0.1",
+                  port: int = 0) -> ThreadingHTTPServer:
+    """Build the mock server; port 0 picks a free port, read it from server.server_address"""
+    handler = type("BoundMockRequestHandler", (MockRequestHandler,), {"tenant": tenant, "behavior": behavior})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    """Dataset and behavior options shared with the benchmark harness"""
+    parser.add_argument('--groups', type=int, default=200, help='permission groups in the tenant')
+    parser.add_argument('--members', type=int, default=100, help='average members per group')
+    parser.add_argument('--users', type=int, default=5000, help='users members are drawn from')
+    parser.add_argument('--roles', type=int, default=100, help='permission roles in the tenant')
+    parser.add_argument('--categories', type=int, default=6, help='permission categories per role')
+    parser.add_argument('--permissions', type=int, default=20, help='permissions per category')
+    parser.add_argument('--grants', type=int, default=3, help='permission groups each role is granted to')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=5.0, help='random +/- variation of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 429')
+    parser.add_argument('--csrf-expiry', type=float, default=0.0,
+                        help='seconds until the CSRF token expires and must be re-fetched; 0 never expires')
+    parser.add_argument('--seed', type=int, default=42, help='dataset and failure injection seed')
+
+
+def tenant_and_behavior(args) -> Tuple[MockTenant, MockBehavior]:
+    tenant = MockTenant(groups=args.groups, members=args.members, users=args.users, roles=args.roles,
+                        categories=args.categories, permissions=args.permissions, grants=args.grants,
+                        seed=args.seed)
+    behavior = MockBehavior(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                            throttle_rate=args.throttle_rate, csrf_expiry=args.csrf_expiry, seed=args.seed)
+    return tenant, behavior
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a generated SuccessFactors tenant locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(*tenant_and_behavior(args), host=args.host, port=args.port)
+    host, port = server.server_address[:2]
+    print(f"Mock SuccessFactors on http://{host}:{port} ({args.groups} groups, {args.roles} roles)")
+    print(f"Session cookie JSESSIONID={MOCK_SESSION_ID}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
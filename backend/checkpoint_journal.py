@@ -0,0 +1,92 @@
+"""
+Extraction Checkpoint Journal
+Append-only record of entities already extracted, so an interrupted run can resume where it stopped
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, Optional, Any
+from models import json_default
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointJournal:
+    """
+    JSON-lines journal of completed entities for one tenant
+    Each line is {"kind", "id", "data"}; a line torn by a crash is ignored on load,
+    so at worst the entity it described is fetched again
+    """
+
+    def __init__(self, company_id: str, resume: bool = False, checkpoint_dir: Optional[str] = None):
+        """
+        Open the tenant's journal; the directory defaults to CHECKPOINT_DIR
+        With resume the existing entries are kept, otherwise the journal starts empty
+        """
+        checkpoint_dir = checkpoint_dir or os.getenv('CHECKPOINT_DIR', '.checkpoints')
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in company_id) or "default"
+        self.path = os.path.join(checkpoint_dir, f"{safe_name}.jsonl")
+        self._entries: Dict[str, Dict[str, Any]] = self._load() if resume else {}
+        self._lock = threading.Lock()
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._ends_mid_line():
+            # Terminate a line torn by the crash so the next entry starts cleanly
+            self._file.write("\n")
+        if resume:
+            counts = {kind: len(entries) for kind, entries in self._entries.items()}
+            logger.info(f"Resuming from checkpoint {self.path}: {counts or 'empty'}")
+
+    def completed(self, kind: str) -> Dict[str, Any]:
+        """Data of every entity of this kind recorded so far, by ID"""
+        with self._lock:
+            return dict(self._entries.get(kind, {}))
+
+    def record(self, kind: str, entity_id: str, data: Any):
+        """Append one completed entity, flushed so it survives a crash of this process"""
+        line = json.dumps({"kind": kind, "id": str(entity_id), "data": data, "at": time.time()},
+                          ensure_ascii=False, default=json_default)
+        with self._lock:
+            self._entries.setdefault(kind, {})[str(entity_id)] = data
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self, remove: bool = False):
+        """Close the journal; remove it once the run has completed and nothing is left to resume"""
+        with self._lock:
+            self._file.close()
+            if remove:
+                try:
+                    os.remove(self.path)
+                    logger.info(f"Run complete, removed checkpoint {self.path}")
+                except FileNotFoundError:
+                    pass
+
+    def _ends_mid_line(self) -> bool:
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                        entries.setdefault(entry["kind"], {})[entry["id"]] = entry["data"]
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Skipping unreadable checkpoint line {line_number} in {self.path}")
+        except FileNotFoundError:
+            pass
+        return entries
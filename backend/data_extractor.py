@@ -3,12 +3,19 @@ SuccessFactors Data Extractor
 Handles API calls to extract permission groups and related data after login
 """
 
-import re
+import os
 import json
+import threading
 import requests
-from typing import Dict, List, Optional, Any
-from urllib.parse import parse_qs, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Any, Callable, Iterator, Tuple, Union
 import logging
+from dwr_parser import parse_dwr_callbacks
+from session_context import SessionContext
+from request_governor import governor
+from telemetry import timed, span
+from models import PermissionGroup, MemberPage, ROLE_PERMISSIONS_EXPAND, compact, compact_role_permissions, json_default
 
 logger = logging.getLogger(__name__)
 
@@ -18,40 +25,82 @@ class SuccessFactorsDataExtractor:
     Extracts data from SuccessFactors APIs after successful login
     """
     
+    ODATA_SERVICE_PATH = "/odatav4/iam/authorization/PAP.svc/v1/"
+    
+    # Role list fields mapped to the PermissionRoleEntity properties they are read from, in order of preference
+    ROLE_ODATA_FIELDS = {
+        'id': ['roleId', 'id'],
+        'name': ['roleName', 'name'],
+        'user_type': ['userType', 'roleType'],
+        'description': ['roleDesc', 'description'],
+        'status': ['status', 'roleStatus'],
+        'rbp_only': ['rbpOnly', 'isRbpOnly'],
+        'last_modified': ['lastModifiedDate', 'lastModified', 'lastModifiedDateTime']
+    }
+    
     def __init__(self, scraper):
         """Initialize with the authenticated scraper instance"""
         self.scraper = scraper
         self.driver = scraper.driver
         self.session = requests.Session()
-        self.base_url = "https://salesdemo.successfactors.eu"
+        self.base_url = scraper.base_url
+        
+        # Optional limiter shared with other extractors hitting the same host; acquire() blocks until a request may go out
+        self.rate_limiter = getattr(scraper, 'rate_limiter', None)
+        
+        # Throttling, retries and circuit breaking shared by every extractor in the process
+        self.governor = governor
+        
+        # Maximum number of DWR calls in flight during extract_all_data
+        self.max_workers = int(os.getenv('EXTRACTION_MAX_WORKERS', '4'))
+        
+        # Number of groups packed into one batched DWR request (1 disables batching)
+        self.batch_size = int(os.getenv('DWR_BATCH_SIZE', '1'))
+        
+        # Members requested per getGroupMembers page
+        self.members_page_size = int(os.getenv('GROUP_MEMBERS_PAGE_SIZE', '1000'))
         
-        # Session data extracted from browser
-        self.csrf_token = None
-        self.session_id = None
-        self.cookies = None
+        # "browser" fetches role permissions through the WebDriver, "http" replays the cookies directly
+        self.role_permissions_mode = os.getenv('ROLE_PERMISSIONS_MODE', 'browser').lower()
+        
+        # "ui" scrapes the role list table, "odata" pages through PermissionRoleEntity
+        self.roles_source = os.getenv('ROLES_SOURCE', 'ui').lower()
+        self.roles_page_size = int(os.getenv('ROLES_ODATA_PAGE_SIZE', '200'))
+        
+        # Size the connection pool so concurrent calls reuse keep-alive connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Session captured from the browser; replaced as a whole on refresh
+        self.context: Optional[SessionContext] = None
         self.headers = {}
+        self._refresh_lock = threading.Lock()
+    
+    @property
+    def csrf_token(self) -> Optional[str]:
+        return self.context.csrf_token if self.context else None
+    
+    @property
+    def session_id(self) -> Optional[str]:
+        return self.context.session_id if self.context else None
+    
+    @property
+    def cookies(self) -> Optional[Dict[str, str]]:
+        return dict(self.context.cookies) if self.context else None
+    
+    @property
+    def page_url(self) -> Optional[str]:
+        return self.context.page_url if self.context else None
         
+    @timed("session_extraction")
     def extract_session_data(self) -> bool:
         """
         Extract session tokens and cookies from the authenticated browser session
         """
         try:
-            # Get cookies from browser
-            browser_cookies = self.driver.get_cookies()
-            self.cookies = {cookie['name']: cookie['value'] for cookie in browser_cookies}
-            
-            # Update requests session with browser cookies
-            for cookie in browser_cookies:
-                self.session.cookies.set(cookie['name'], cookie['value'])
-            
-            # Extract CSRF token from page or meta tags
-            self.csrf_token = self._extract_csrf_token()
-            
-            # Extract session ID from script or cookies
-            self.session_id = self._extract_session_id()
-            
-            # Setup default headers
-            self._setup_headers()
+            # Capture everything once so worker threads never touch the WebDriver
+            self.apply_context(SessionContext.capture(self.driver))
             
             logger.info("Session data extracted successfully")
             return True
@@ -60,79 +109,134 @@ class SuccessFactorsDataExtractor:
             logger.error(f"Failed to extract session data: {str(e)}")
             return False
     
-    def _extract_csrf_token(self) -> Optional[str]:
-        """Extract CSRF token from the page"""
-        try:
-            # Try to find CSRF token in meta tags
-            csrf_elements = self.driver.find_elements("css selector", "meta[name='_csrf'], meta[name='csrf-token']")
-            if csrf_elements:
-                return csrf_elements[0].get_attribute("content")
-            
-            # Try to find in script tags or page source
-            page_source = self.driver.page_source
-            
-            # Look for common CSRF token patterns
-            csrf_patterns = [
-                r'csrfToken["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                r'_csrf["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                r'csrf["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                r'token["\']?\s*[:=]\s*["\']([^"\']+)["\']'
-            ]
-            
-            for pattern in csrf_patterns:
-                match = re.search(pattern, page_source, re.IGNORECASE)
-                if match:
-                    token = match.group(1)
-                    if len(token) > 10:  # Valid tokens are usually longer
-                        return token
+    def apply_context(self, context: SessionContext):
+        """Use a captured session context for all following requests"""
+        self.session.cookies.clear()
+        for name, value in context.cookies.items():
+            self.session.cookies.set(name, value)
+        
+        self.context = context
+        self._setup_headers()
+    
+    def refresh_session(self, stale: Optional[SessionContext] = None) -> bool:
+        """
+        Re-capture the session after a request was rejected
+        Concurrent callers that saw the same stale context share one refresh. An expired
+        CSRF token is first re-fetched over HTTP; only if that fails is the browser page
+        reloaded and the session captured again
+        """
+        with self._refresh_lock:
+            if stale is not None and self.context is not stale:
+                # Another thread already refreshed while we waited
+                return self.context is not None
             
-            # Check URL parameters
-            current_url = self.driver.current_url
-            parsed_url = urlparse(current_url)
-            query_params = parse_qs(parsed_url.query)
+            if self.context is not None:
+                csrf_token = self._fetch_csrf_token()
+                if csrf_token:
+                    logger.info("Refreshed CSRF token over HTTP")
+                    self.apply_context(self.context.with_csrf_token(csrf_token))
+                    return True
             
-            for param_name in ['_s.crb', 'csrf', 'token']:
-                if param_name in query_params:
-                    return query_params[param_name][0]
+            if self.driver is None:
+                logger.error("Session expired and no browser is available to refresh it")
+                return False
             
-            logger.warning("CSRF token not found")
+            logger.info("Reloading the browser page to refresh the session")
+            try:
+                self.driver.refresh()
+            except Exception as e:
+                logger.warning(f"Error reloading page before session refresh: {str(e)}")
+            return self.extract_session_data()
+    
+    def _fetch_csrf_token(self) -> Optional[str]:
+        """Ask the OData service for a fresh CSRF token with the current cookies"""
+        try:
+            response = self.governor.send(
+                self.session, "GET", f"{self.base_url}{self.ODATA_SERVICE_PATH}",
+                headers={"accept": "application/json", "x-csrf-token": "Fetch"},
+                allow_redirects=False,
+                timeout=10
+            )
+            token = response.headers.get("x-csrf-token")
+            if response.status_code == 200 and token and token.lower() != "required":
+                return token
             return None
             
         except Exception as e:
-            logger.error(f"Error extracting CSRF token: {str(e)}")
+            logger.error(f"Error fetching CSRF token: {str(e)}")
             return None
     
-    def _extract_session_id(self) -> Optional[str]:
-        """Extract session ID from cookies or page"""
+    def _send(self, method: str, url: str, headers: Dict[str, str], **kwargs):
+        """
+        Send a request with the captured session, refreshing it once if rejected
+        Only a 401/403 or a CSRF rejection triggers the refresh; the retry carries
+        the new cookies and the refreshed token and Referer headers
+        """
+        context = self.context
+        response = self._governed_send(method, url, headers, **kwargs)
+        
+        if not self._is_session_rejected(response):
+            return response
+        
+        logger.warning(f"Session rejected with HTTP {response.status_code}, refreshing")
+        if not self.refresh_session(context):
+            return response
+        return self._governed_send(method, url, self._refreshed_headers(headers), **kwargs)
+    
+    def _governed_send(self, method: str, url: str, headers: Dict[str, str], **kwargs):
+        """Send through the governor; every attempt, retries included, waits for the host rate limiter"""
+        session = self.session
+        
+        def attempt():
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            return session.request(method, url, headers=headers, **kwargs)
+        
+        return self.governor.execute(method, url, attempt)
+    
+    def _refreshed_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """Replace the session-derived headers of a request with the current context's values"""
+        refreshed = {k: v for k, v in headers.items() if k not in ("x-ajax-token", "x-csrf-token")}
+        refreshed["Referer"] = self.page_url
+        if self.csrf_token:
+            refreshed["x-csrf-token"] = self.csrf_token
+            if "x-ajax-token" in headers:
+                refreshed["x-ajax-token"] = self.csrf_token
+        return refreshed
+    
+    @staticmethod
+    def _is_session_rejected(response) -> bool:
+        """True for expired sessions and expired CSRF tokens"""
+        if response.status_code in (401, 403):
+            return True
+        return response.headers.get("x-csrf-token", "").lower() == "required"
+    
+    def is_session_valid(self, timeout: int = 10) -> bool:
+        """
+        Check that the captured cookies still authenticate with one cheap OData request
+        An expired session answers with 401/403 or a redirect to the login page
+        """
         try:
-            # Try common session cookie names
-            session_cookies = ['JSESSIONID', 'sessionId', 'sid']
-            for cookie_name in session_cookies:
-                if cookie_name in self.cookies:
-                    return self.cookies[cookie_name]
-            
-            # Try to extract from page source
-            page_source = self.driver.page_source
-            session_patterns = [
-                r'sessionId["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                r'scriptSessionId["\']?\s*[:=]\s*["\']([^"\']+)["\']'
-            ]
+            url = f"{self.base_url}{self.ODATA_SERVICE_PATH}PermissionRoleEntity?$top=1"
+            response = self.governor.send(
+                self.session, "GET", url,
+                headers={"accept": "application/json", "odata-version": "4.0"},
+                allow_redirects=False,
+                timeout=timeout
+            )
             
-            for pattern in session_patterns:
-                match = re.search(pattern, page_source, re.IGNORECASE)
-                if match:
-                    return match.group(1)
+            if response.status_code == 200:
+                return True
             
-            return None
+            logger.info(f"Session check failed: HTTP {response.status_code}")
+            return False
             
         except Exception as e:
-            logger.error(f"Error extracting session ID: {str(e)}")
-            return None
+            logger.error(f"Error checking session: {str(e)}")
+            return False
     
     def _setup_headers(self):
         """Setup default headers for API requests"""
-        current_url = self.driver.current_url
-        
         self.headers = {
             "accept": "*/*",
             "accept-language": "en-US,en;q=0.9,de;q=0.8,fr;q=0.7",
@@ -145,7 +249,7 @@ class SuccessFactorsDataExtractor:
             "sec-fetch-mode": "cors",
             "sec-fetch-site": "same-origin",
             "x-sap-page-info": f"companyId={self.scraper.company_id}&moduleId=ADMIN&pageId=ADMIN&pageQualifier=MANAGE_RBP_GROUP&uiVersion=V12",
-            "Referer": current_url
+            "Referer": self.page_url
         }
         
         if self.csrf_token:
@@ -157,7 +261,8 @@ class SuccessFactorsDataExtractor:
         Fetch permission groups data from the first endpoint
         """
         try:
-            if not self.extract_session_data():
+            # Reuse the captured session so pooled extractors never go back to the browser
+            if self.context is None and not self.extract_session_data():
                 logger.error("Failed to extract session data")
                 return None
             
@@ -166,7 +271,7 @@ class SuccessFactorsDataExtractor:
             # Prepare request body based on the provided example
             body_data = [
                 "callCount=1",
-                f"page={self.driver.current_url}",
+                f"page={self.page_url}",
                 "httpSessionId=",
                 f"scriptSessionId={self.session_id or '80A8BD291A8E635A37D57F13E5D1F423722'}",
                 "c0-scriptName=dgListControllerProxy",
@@ -187,11 +292,11 @@ class SuccessFactorsDataExtractor:
             
             logger.info("Fetching permission groups data...")
             
-            response = self.session.post(url, data=body, headers=headers)
+            response = self._send("POST", url, headers, data=body)
             
             if response.status_code == 200:
                 logger.info("Permission groups data fetched successfully")
-                return self._parse_dwr_response(response.text)
+                return self._parse_dwr_response(response.content)
             else:
                 logger.error(f"Failed to fetch permission groups: HTTP {response.status_code}")
                 return None
@@ -230,11 +335,11 @@ class SuccessFactorsDataExtractor:
             headers["x-event-id"] = f"EVENT-PLT-ADMIN_MANAGE_RBP_GROUP-{self._generate_event_id()}-1"
             headers["x-subaction"] = "0"
             
-            response = self.session.post(url, data=body, headers=headers)
+            response = self._send("POST", url, headers, data=body)
             
             if response.status_code == 200:
                 logger.info(f"Details fetched for group {group_id}")
-                return self._parse_dwr_response(response.text)
+                return self._parse_dwr_response(response.content)
             else:
                 logger.error(f"Failed to fetch group details: HTTP {response.status_code}")
                 return None
@@ -243,18 +348,21 @@ class SuccessFactorsDataExtractor:
             logger.error(f"Error fetching group details: {str(e)}")
             return None
     
-    def get_group_members(self, group_id: str) -> Optional[Dict]:
+    def get_group_members(self, group_id: str, start: int = 0, max_results: Optional[int] = None) -> Optional[Dict]:
         """
-        Fetch the list of members for a specific permission group
+        Fetch one page of members for a specific permission group
+        max_results defaults to GROUP_MEMBERS_PAGE_SIZE; use get_all_group_members
+        or iter_group_members to get every member
         """
         try:
-            logger.info(f"Fetching members for permission group: {group_id}")
+            max_results = max_results or self.members_page_size
+            logger.info(f"Fetching members for permission group: {group_id} (start {start}, max {max_results})")
             
             url = f"{self.base_url}/xi/ajax/remoting/call/plaincall/dGUpdateControllerProxy.getGroupMembers.dwr"
             
             body_data = [
                 "callCount=1",
-                f"page={self.driver.current_url}",
+                f"page={self.page_url}",
                 "httpSessionId=",
                 f"scriptSessionId={self.session_id or '80A8BD291A8E635A37D57F13E5D1F423722'}",
                 "c0-scriptName=dGUpdateControllerProxy",
@@ -262,8 +370,8 @@ class SuccessFactorsDataExtractor:
                 "c0-id=0",
                 f"c0-param0=number:{group_id}",
                 "c0-param1=string:permission",
-                "c0-param2=number:0",  # start index
-                "c0-param3=number:1000",  # max results, adjust if needed
+                f"c0-param2=number:{start}",  # start index
+                f"c0-param3=number:{max_results}",  # max results
                 "batchId=7"
             ]
             
@@ -275,11 +383,11 @@ class SuccessFactorsDataExtractor:
             headers["x-event-id"] = f"EVENT-PLT-ADMIN_MANAGE_RBP_GROUP-{self._generate_event_id()}-2"
             headers["x-subaction"] = "0"
             
-            response = self.session.post(url, data=body, headers=headers)
+            response = self._send("POST", url, headers, data=body)
             
             if response.status_code == 200:
                 logger.info(f"Members fetched for group {group_id}")
-                return self._parse_dwr_response(response.text)
+                return self._parse_dwr_response(response.content)
             else:
                 logger.error(f"Failed to fetch group members: HTTP {response.status_code}")
                 return None
@@ -288,43 +396,331 @@ class SuccessFactorsDataExtractor:
             logger.error(f"Error fetching group members: {str(e)}")
             return None
     
-    def _parse_dwr_response(self, response_text: str) -> Optional[Dict]:
+    def iter_group_members(self, group_id: str, page_size: Optional[int] = None,
+                           start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every member of a permission group, fetching page_size members per request
+        Only one page is held in memory at a time. Raises RuntimeError if a page
+        cannot be fetched, so a partial member list is never mistaken for a complete one
+        """
+        page_size = page_size or self.members_page_size
+        
+        while True:
+            page = self.get_group_members(group_id, start, page_size)
+            if self._is_error_response(page):
+                raise RuntimeError(f"Failed to fetch members of group {group_id} at index {start}")
+            
+            list_key = self._member_list_key(page)
+            members = page[list_key] if list_key else []
+            for member in members:
+                yield member
+            
+            start += len(members)
+            total = self._member_total(page)
+            if not members or len(members) < page_size or (total is not None and start >= total):
+                return
+    
+    def get_all_group_members(self, group_id: str, page_size: Optional[int] = None) -> Optional[Dict]:
+        """
+        Fetch every member of a permission group, paging past the per-request limit
+        Returns the first page's response with its member list replaced by the full list
+        """
+        page_size = page_size or self.members_page_size
+        first_page = self.get_group_members(group_id, 0, page_size)
+        if self._is_error_response(first_page):
+            return first_page
+        return self._complete_member_pages(group_id, first_page, page_size)
+    
+    def _complete_member_pages(self, group_id: str, first_page: Dict, page_size: Optional[int] = None) -> Dict:
+        """Append the remaining member pages to a first getGroupMembers page if it was truncated"""
+        page_size = page_size or self.members_page_size
+        list_key = self._member_list_key(first_page)
+        if not list_key:
+            return first_page
+        
+        members = list(first_page[list_key])
+        total = self._member_total(first_page)
+        truncated = len(members) < total if total is not None else len(members) >= page_size
+        if not truncated:
+            return first_page
+        
+        logger.info(f"Group {group_id} has more than {len(members)} members, fetching remaining pages")
+        members.extend(self.iter_group_members(group_id, page_size, start=len(members)))
+        
+        complete = dict(first_page)
+        complete[list_key] = members
+        return complete
+    
+    @staticmethod
+    def _member_list_key(page: Dict) -> Optional[str]:
+        """Find the key holding the member list in a getGroupMembers response"""
+        for key in ('memberList', 'members', 'userList', 'groupMembers', 'resultList'):
+            if isinstance(page.get(key), list):
+                return key
+        return next((key for key, value in page.items() if isinstance(value, list)), None)
+    
+    @staticmethod
+    def _member_total(page: Dict) -> Optional[int]:
+        """Total member count reported by a getGroupMembers response, if any"""
+        for key in ('totalCount', 'total', 'totalSize', 'allMemberCount'):
+            if isinstance(page.get(key), int):
+                return page[key]
+        return None
+    
+    def get_groups_batch(self, group_ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Fetch details and members for several permission groups in one batched DWR request
+        Each group contributes a retrieveGroup and a getGroupMembers call; returns
+        {group_id: {"details": ..., "members": ...}} or None if the request failed
+        """
+        try:
+            logger.info(f"Fetching details and members for {len(group_ids)} groups in one batch")
+            
+            calls = []
+            for group_id in group_ids:
+                calls.append(("dGUpdateControllerProxy", "retrieveGroup", [
+                    f"number:{group_id}",
+                    "string:permission"
+                ]))
+                calls.append(("dGUpdateControllerProxy", "getGroupMembers", [
+                    f"number:{group_id}",
+                    "string:permission",
+                    "number:0",  # start index
+                    f"number:{self.members_page_size}"  # max results; later pages are fetched separately
+                ]))
+            
+            url = f"{self.base_url}/xi/ajax/remoting/call/plaincall/Multiple.{len(calls)}.dwr"
+            body = self._build_dwr_batch_body(calls, batch_id=8)
+            
+            headers = self.headers.copy()
+            headers["viewid"] = "/ui/rbp/pages/manage_permission_groups.xhtml"
+            headers["x-event-id"] = f"EVENT-PLT-ADMIN_MANAGE_RBP_GROUP-{self._generate_event_id()}-3"
+            headers["x-subaction"] = "0"
+            
+            response = self._send("POST", url, headers, data=body)
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch group batch: HTTP {response.status_code}")
+                return None
+            
+            callbacks = self._parse_dwr_callbacks(response.content)
+            missing = {"error": "No DWR callback found for call", "raw_response": ""}
+            
+            results = {}
+            for index, group_id in enumerate(group_ids):
+                results[group_id] = {
+                    "details": callbacks.get(str(2 * index), missing),
+                    "members": callbacks.get(str(2 * index + 1), missing)
+                }
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error fetching group batch: {str(e)}")
+            return None
+    
+    def _build_dwr_batch_body(self, calls: List[tuple], batch_id: int) -> str:
+        """
+        Build a DWR plaincall body carrying several calls
+        calls is a list of (script_name, method_name, params) with params already typed, e.g. "number:42"
+        """
+        body_data = [
+            f"callCount={len(calls)}",
+            f"page={self._get_relative_page_url()}",
+            "httpSessionId=",
+            f"scriptSessionId={self.session_id or '80A8BD291A8E635A37D57F13E5D1F423722'}"
+        ]
+        
+        for call_id, (script_name, method_name, params) in enumerate(calls):
+            body_data.append(f"c{call_id}-scriptName={script_name}")
+            body_data.append(f"c{call_id}-methodName={method_name}")
+            body_data.append(f"c{call_id}-id={call_id}")
+            for param_idx, param in enumerate(params):
+                body_data.append(f"c{call_id}-param{param_idx}={param}")
+        
+        body_data.append(f"batchId={batch_id}")
+        return "\n".join(body_data)
+    
+    def fetch_role_permissions(self, role_id: str) -> Dict[str, Any]:
+        """
+        Fetch permissions for a specific role from the OData API over the pooled HTTP session
+        Same result as SuccessFactorsScraper.fetch_role_permissions without going through the browser
+        """
+        try:
+            logger.info(f"Fetching permissions for role ID: {role_id}")
+            
+            url = f"{self.base_url}{self.ODATA_SERVICE_PATH}PermissionRoleEntity({role_id})?$expand={ROLE_PERMISSIONS_EXPAND}"
+            
+            response = self._send("GET", url, self._odata_headers(), timeout=30)
+            
+            if response.status_code == 200:
+                logger.info(f"Successfully fetched permissions for role {role_id}")
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch permissions for role {role_id}: HTTP {response.status_code}")
+                return {}
+                
+        except Exception as e:
+            logger.error(f"Error fetching permissions for role {role_id}: {str(e)}")
+            return {}
+    
+    def list_roles(self, expand_categories: bool = False, page_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List all roles by paging through the PermissionRoleEntity OData collection
+        Returns the same dicts as SuccessFactorsScraper.extract_roles_data; with
+        expand_categories each role also carries its 'permissions' (categories and grant rules) from the same request
+        """
+        try:
+            page_size = page_size or self.roles_page_size
+            url = f"{self.base_url}{self.ODATA_SERVICE_PATH}PermissionRoleEntity"
+            
+            params = {"$top": page_size, "$skip": 0}
+            if expand_categories:
+                # Expanded entities are stored as the role's permissions, so they must stay whole
+                params["$expand"] = ROLE_PERMISSIONS_EXPAND
+            else:
+                # Every candidate name, so the fallback names in ROLE_ODATA_FIELDS can match too
+                select = sorted({name for names in self.ROLE_ODATA_FIELDS.values() for name in names})
+                params["$select"] = ",".join(select)
+            
+            roles = []
+            page = 0
+            while True:
+                page += 1
+                response = self._send("GET", url, self._odata_headers(), params=params, timeout=60)
+                
+                if response.status_code == 400 and "$select" in params and page == 1:
+                    # Tenant does not know one of the selected properties; fetch whole entities instead
+                    logger.warning("Role $select rejected, listing roles without $select")
+                    del params["$select"]
+                    page -= 1
+                    continue
+                
+                if response.status_code != 200:
+                    logger.error(f"Failed to list roles page {page}: HTTP {response.status_code}")
+                    return roles
+                
+                data = response.json()
+                entities = data.get("value", [])
+                roles.extend(self._role_from_entity(entity, expand_categories) for entity in entities)
+                logger.info(f"Fetched role page {page} ({len(entities)} roles)")
+                
+                next_link = data.get("@odata.nextLink")
+                if next_link:
+                    # Server-driven paging: the link already carries the query options
+                    url = next_link if next_link.startswith("http") else f"{self.base_url}{self.ODATA_SERVICE_PATH}{next_link}"
+                    params = None
+                elif len(entities) < page_size or params is None:
+                    break
+                else:
+                    params["$skip"] += page_size
+            
+            logger.info(f"Listed {len(roles)} roles from OData")
+            return roles
+            
+        except Exception as e:
+            logger.error(f"Error listing roles: {str(e)}")
+            return []
+    
+    def _role_from_entity(self, entity: Dict[str, Any], include_permissions: bool) -> Dict[str, Any]:
+        """Map a PermissionRoleEntity to the role list dict shape"""
+        role = {}
+        for field, names in self.ROLE_ODATA_FIELDS.items():
+            value = next((entity[name] for name in names if entity.get(name) is not None), "")
+            if isinstance(value, bool):
+                value = "Yes" if value else "No"
+            role[field] = str(value)
+        role['actions'] = ""
+        
+        if include_permissions:
+            role['permissions'] = compact_role_permissions(entity)
+        return role
+    
+    def _odata_headers(self) -> Dict[str, str]:
+        """Headers for OData v4 requests made with the captured session"""
+        headers = {
+            "accept": "application/json",
+            "odata-version": "4.0",
+            "content-type": "application/json",
+            "Referer": self.page_url
+        }
+        if self.csrf_token:
+            headers["x-csrf-token"] = self.csrf_token
+        return headers
+    
+    def attach_role_permissions(self, roles: List[Dict[str, Any]], max_workers: Optional[int] = None,
+                                journal=None) -> int:
+        """
+        Fetch permissions for every role concurrently and store them under role['permissions']
+        as RolePermissions records. With a CheckpointJournal, roles already journaled are filled
+        from it and every newly fetched role is journaled. Returns the number of roles that received permissions
+        """
+        workers = max(1, max_workers or self.max_workers)
+        journaled = journal.completed("role_permissions") if journal is not None else {}
+        
+        for role in roles:
+            role['permissions'] = compact_role_permissions(journaled.get(str(role.get('id')), {}))
+        roles_with_permissions = sum(1 for role in roles if role['permissions'])
+        if journaled:
+            logger.info(f"Resuming: {roles_with_permissions}/{len(roles)} roles already have permissions")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.fetch_role_permissions, role['id']): role
+                for role in roles if role.get('id') and not role['permissions']
+            }
+            for future in as_completed(futures):
+                role = futures[future]
+                try:
+                    permissions = future.result()
+                except Exception as e:
+                    logger.warning(f"Error fetching permissions for role {role['id']}: {str(e)}")
+                    continue
+                if permissions:
+                    if journal is not None:
+                        journal.record("role_permissions", role['id'], permissions)
+                    role['permissions'] = compact_role_permissions(permissions)
+                    roles_with_permissions += 1
+        
+        logger.info(f"Permissions fetched for {roles_with_permissions}/{len(roles)} roles")
+        return roles_with_permissions
+    
+    def _parse_dwr_response(self, response_body: Union[str, bytes]) -> Optional[Dict]:
         """
         Parse DWR (Direct Web Remoting) response format based on actual SuccessFactors structure
+        Returns the payload of the first callback in the response
         """
         try:
-            # Look for the DWR callback line
-            lines = response_text.strip().split('\n')
-            
-            for line in lines:
-                if line.startswith('dwr.engine._remoteHandleCallback'):
-                    # Extract the JSON data from the callback
-                    # Pattern: dwr.engine._remoteHandleCallback('4','0',{JSON_DATA});
-                    match = re.search(r"dwr\.engine\._remoteHandleCallback\('[^']*',\s*'[^']*',\s*(.+)\);?$", line)
-                    if match:
-                        try:
-                            json_str = match.group(1)
-                            # Parse the JSON data
-                            data = json.loads(json_str)
-                            
-                            # The response structure contains:
-                            # - attributes: metadata
-                            # - groupList: array of group objects
-                            # - totalCount: total number of groups
-                            
-                            return data
-                            
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to parse JSON from DWR response: {str(e)}")
-                            return {"error": "Invalid JSON in DWR response", "raw": json_str}
+            callbacks = self._parse_dwr_callbacks(response_body)
+            
+            if callbacks:
+                # The response structure contains:
+                # - attributes: metadata
+                # - groupList: array of group objects
+                # - totalCount: total number of groups
+                return next(iter(callbacks.values()))
             
             # If no callback found, return raw response
             logger.warning("No DWR callback found in response")
-            return {"error": "No DWR callback found", "raw_response": response_text}
+            return {"error": "No DWR callback found", "raw_response": self._response_text(response_body)}
             
         except Exception as e:
             logger.error(f"Error parsing DWR response: {str(e)}")
-            return {"error": str(e), "raw_response": response_text}
+            return {"error": str(e), "raw_response": self._response_text(response_body)}
+    
+    def _parse_dwr_callbacks(self, response_body: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        Demultiplex a DWR response into {call_id: payload}
+        Batched responses carry one dwr.engine._remoteHandleCallback line per call;
+        the raw response bytes are scanned and decoded without building a str copy
+        """
+        return parse_dwr_callbacks(response_body)
+    
+    @staticmethod
+    def _response_text(response_body: Union[str, bytes]) -> str:
+        """Decode a response body for error reporting"""
+        if isinstance(response_body, bytes):
+            return response_body.decode('utf-8', 'replace')
+        return response_body
     
     def _generate_event_id(self) -> str:
         """Generate a unique event ID for requests"""
@@ -334,9 +730,21 @@ class SuccessFactorsDataExtractor:
         random_part = str(random.randint(100000, 999999))
         return f"or46abe15-20251015071438-{random_part}"
     
-    def extract_all_data(self) -> Dict[str, Any]:
+    def extract_all_data(self, max_workers: Optional[int] = None, batch_size: Optional[int] = None,
+                         state_store=None, progress_callback: Optional[Callable[..., None]] = None,
+                         journal=None) -> Dict[str, Any]:
         """
         Extract all permission groups and their details
+        Group details and members are fetched concurrently, with at most
+        max_workers DWR requests in flight (defaults to EXTRACTION_MAX_WORKERS).
+        With batch_size > 1 (defaults to DWR_BATCH_SIZE) each request carries
+        the calls for batch_size groups.
+        With an ExtractionStateStore only new or changed groups are fetched, and
+        the result gains an "incremental" section with unchanged IDs and tombstones.
+        progress_callback, if given, is called with groups_done, groups_total and
+        failures keyword arguments as groups complete.
+        With a CheckpointJournal each fully fetched group is journaled as it completes,
+        and groups already in the journal are taken from it instead of being fetched
         """
         try:
             logger.info("Starting full data extraction...")
@@ -349,11 +757,7 @@ class SuccessFactorsDataExtractor:
             result = {
                 "permission_groups_overview": groups_response,
                 "group_details": {},
-                "summary": {
-                    "total_groups": 0,
-                    "extracted_details": 0,
-                    "failed_extractions": 0
-                }
+                "summary": self._new_summary()
             }
             
             # Extract basic group info
@@ -363,31 +767,47 @@ class SuccessFactorsDataExtractor:
                 # Extract group IDs and fetch details for each
                 group_ids = self._extract_group_ids(groups_response)
                 
-                logger.info(f"Found {len(group_ids)} groups, fetching details...")
+                plan = None
+                if state_store is not None:
+                    listing = [
+                        (str(group['groupId']), group) for group in groups_response['groupList']
+                        if isinstance(group, dict) and 'groupId' in group
+                    ]
+                    plan = state_store.plan("groups", listing)
+                    group_ids = plan.to_fetch
                 
-                for i, group_id in enumerate(group_ids, 1):
-                    logger.info(f"Fetching details for group {i}/{len(group_ids)}: {group_id}")
-                    
-                    try:
-                        details = self.get_permission_group_details(group_id)
-                        if details:
-                            result["group_details"][group_id] = details
-                            result["summary"]["extracted_details"] += 1
-                            
-                            # Fetch group members
-                            members = self.get_group_members(group_id)
-                            if members:
-                                result["group_details"][group_id]["members"] = members
-                                logger.info(f"Members fetched for group {group_id}")
-                            else:
-                                logger.warning(f"Failed to get members for group {group_id}")
-                        else:
-                            result["summary"]["failed_extractions"] += 1
-                            logger.warning(f"Failed to get details for group {group_id}")
-                    
-                    except Exception as e:
-                        result["summary"]["failed_extractions"] += 1
-                        logger.error(f"Error fetching details for group {group_id}: {str(e)}")
+                resumed = {}
+                if journal is not None:
+                    journaled = journal.completed("group")
+                    resumed = {
+                        group_id: self._compact_outcome(journaled[group_id])
+                        for group_id in group_ids if group_id in journaled
+                    }
+                    logger.info(f"Resuming: {len(resumed)}/{len(group_ids)} groups already extracted")
+                    result["checkpoint"] = {"journal": journal.path, "resumed_groups": len(resumed)}
+                
+                pending = [group_id for group_id in group_ids if group_id not in resumed]
+                outcomes = self._fetch_groups(pending, max_workers, batch_size, progress_callback, journal)
+                outcomes.update(resumed)
+                
+                # Merge in the original group order so the output is deterministic
+                for group_id in group_ids:
+                    details = self._apply_group_outcome(result["summary"], group_id, outcomes[group_id])
+                    if details is not None:
+                        result["group_details"][group_id] = details
+                
+                if plan is not None:
+                    # Groups whose members failed stay pending so the next run retries them
+                    fetched = [
+                        group_id for group_id, details in result["group_details"].items()
+                        if "members" in details
+                    ]
+                    state_store.commit(plan, fetched)
+                    result["incremental"] = {
+                        "summary": plan.summary(),
+                        "unchanged_groups": plan.unchanged,
+                        "tombstones": plan.tombstones()
+                    }
             
             else:
                 result["summary"]["total_groups"] = 0
@@ -396,7 +816,8 @@ class SuccessFactorsDataExtractor:
             logger.info(f"Data extraction completed. "
                        f"Total: {result['summary']['total_groups']}, "
                        f"Detailed: {result['summary']['extracted_details']}, "
-                       f"Failed: {result['summary']['failed_extractions']}")
+                       f"Failed: {result['summary']['failed_extractions']}, "
+                       f"Failed members: {result['summary']['failed_member_extractions']}")
             
             return result
             
@@ -404,6 +825,220 @@ class SuccessFactorsDataExtractor:
             logger.error(f"Error in full data extraction: {str(e)}")
             return {"error": str(e)}
     
+    def iter_group_records(self, max_workers: Optional[int] = None,
+                           batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the permission groups extraction as records instead of one document
+        Yields an "overview" record, one "group" record per group as soon as its
+        detail and member calls finish (in completion order), then a "summary" record.
+        Only the groups still in flight are held in memory
+        """
+        groups_response = self.get_permission_groups()
+        if not groups_response:
+            yield {"type": "error", "error": "Failed to fetch permission groups"}
+            return
+        
+        group_ids = self._extract_group_ids(groups_response)
+        summary = self._new_summary()
+        summary["total_groups"] = len(groups_response.get('groupList', []))
+        
+        yield {
+            "type": "overview",
+            "total_groups": summary["total_groups"],
+            "permission_groups_overview": groups_response
+        }
+        
+        for group_id, outcome in self._iter_group_outcomes(group_ids, max_workers, batch_size):
+            details = self._apply_group_outcome(summary, group_id, outcome)
+            yield {
+                "type": "group",
+                "group_id": group_id,
+                "details": details,
+                "failures": outcome["failures"]
+            }
+        
+        yield {"type": "summary", "summary": summary}
+    
+    def _fetch_groups(self, group_ids: List[str], max_workers: Optional[int] = None,
+                      batch_size: Optional[int] = None,
+                      progress_callback: Optional[Callable[..., None]] = None,
+                      journal=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch details and members for the given groups on the worker pool
+        Returns {group_id: {"details", "members", "failures"}}; groups whose details
+        and members both arrived are journaled as they complete
+        """
+        outcomes = {}
+        failures = 0
+        if progress_callback:
+            progress_callback(groups_done=0, groups_total=len(group_ids), failures=0)
+        
+        for group_id, outcome in self._iter_group_outcomes(group_ids, max_workers, batch_size):
+            outcomes[group_id] = outcome
+            failures += len(outcome["failures"])
+            if journal is not None and outcome["details"] is not None and outcome["members"] is not None:
+                journal.record("group", group_id, outcome)
+            if progress_callback:
+                progress_callback(groups_done=len(outcomes), groups_total=len(group_ids), failures=failures)
+        
+        logger.info(f"Processed groups {len(outcomes)}/{len(group_ids)}")
+        return outcomes
+    
+    def _iter_group_outcomes(self, group_ids: List[str], max_workers: Optional[int] = None,
+                             batch_size: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield (group_id, outcome) pairs as their requests complete
+        At most twice max_workers chunks are queued at once, so a slow consumer
+        does not let finished results pile up
+        """
+        workers = max(1, max_workers or self.max_workers)
+        size = max(1, batch_size or self.batch_size)
+        chunks = [group_ids[i:i + size] for i in range(0, len(group_ids), size)]
+        
+        logger.info(f"Fetching details for {len(group_ids)} groups in {len(chunks)} requests with {workers} workers...")
+        
+        pending_chunks = iter(chunks)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for chunk in pending_chunks:
+                futures[executor.submit(self._fetch_group_chunk, chunk)] = chunk
+                if len(futures) >= workers * 2:
+                    break
+            
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = futures.pop(future)
+                    try:
+                        outcomes = future.result()
+                    except Exception as e:
+                        outcomes = {
+                            group_id: {
+                                "details": None,
+                                "members": None,
+                                "failures": [{"group_id": group_id, "call": "retrieveGroup", "error": str(e)}]
+                            }
+                            for group_id in chunk
+                        }
+                    
+                    next_chunk = next(pending_chunks, None)
+                    if next_chunk is not None:
+                        futures[executor.submit(self._fetch_group_chunk, next_chunk)] = next_chunk
+                    
+                    for group_id in chunk:
+                        yield group_id, outcomes[group_id]
+    
+    def _fetch_group_chunk(self, group_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch one chunk of groups, as a single batched request when it holds more than one group
+        Responses are turned into compact records here, so the raw dicts are released on the worker
+        """
+        if len(group_ids) == 1:
+            return {group_ids[0]: self._compact_outcome(self._fetch_group_data(group_ids[0]))}
+        
+        responses = self.get_groups_batch(group_ids)
+        outcomes = {}
+        for group_id in group_ids:
+            failures = []
+            if responses is None:
+                failures.append({"group_id": group_id, "call": "retrieveGroup", "error": "Batch request failed"})
+                outcomes[group_id] = {"details": None, "members": None, "failures": failures}
+                continue
+            
+            details = self._check_response(responses[group_id]["details"], group_id, "retrieveGroup", failures)
+            members = None
+            if details is not None:
+                members = self._check_response(responses[group_id]["members"], group_id, "getGroupMembers", failures)
+            if members is not None:
+                # The batch only carries the first member page
+                try:
+                    members = self._complete_member_pages(group_id, members)
+                except Exception as e:
+                    failures.append({"group_id": group_id, "call": "getGroupMembers", "error": str(e)})
+                    members = None
+            outcomes[group_id] = self._compact_outcome({"details": details, "members": members, "failures": failures})
+        return outcomes
+    
+    @staticmethod
+    def _compact_outcome(outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a group outcome's details and members responses with PermissionGroup and MemberPage records"""
+        return {
+            "details": compact(outcome["details"], PermissionGroup),
+            "members": compact(outcome["members"], MemberPage),
+            "failures": outcome["failures"]
+        }
+    
+    def _fetch_group_data(self, group_id: str) -> Dict[str, Any]:
+        """
+        Fetch details and members for a single group, recording each failed call
+        Runs on a worker thread, so it must only use the requests session
+        """
+        failures = []
+        members = None
+        
+        details = self._call_safely(self.get_permission_group_details, group_id, "retrieveGroup", failures)
+        if details is not None:
+            members = self._call_safely(self.get_all_group_members, group_id, "getGroupMembers", failures)
+        
+        return {"details": details, "members": members, "failures": failures}
+    
+    def _call_safely(self, fetch, group_id: str, call_name: str, failures: List[Dict]) -> Optional[Dict]:
+        """Run a single DWR fetch and append a failure record if it does not return usable data"""
+        try:
+            data = fetch(group_id)
+        except Exception as e:
+            failures.append({"group_id": group_id, "call": call_name, "error": str(e)})
+            return None
+        return self._check_response(data, group_id, call_name, failures)
+    
+    def _check_response(self, data: Optional[Dict], group_id: str, call_name: str, failures: List[Dict]) -> Optional[Dict]:
+        """Return the parsed data, or None after recording a failure if it is empty or an error dict"""
+        if self._is_error_response(data):
+            error = data.get("error") if isinstance(data, dict) else None
+            failures.append({"group_id": group_id, "call": call_name, "error": error or "No data returned"})
+            return None
+        return data
+    
+    @staticmethod
+    def _is_error_response(data: Optional[Dict]) -> bool:
+        """Check whether a parsed DWR response is empty or one of the parser's error dicts"""
+        if not data:
+            return True
+        return isinstance(data, dict) and "error" in data and ("raw" in data or "raw_response" in data)
+    
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        """Empty extraction summary counters"""
+        return {
+            "total_groups": 0,
+            "extracted_details": 0,
+            "failed_extractions": 0,
+            "failed_member_extractions": 0,
+            "failures": []
+        }
+    
+    def _apply_group_outcome(self, summary: Dict[str, Any], group_id: str, outcome: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Count one group's fetch outcome in the summary
+        Returns the group details with members attached, or None if the details failed
+        """
+        summary["failures"].extend(outcome["failures"])
+        
+        if outcome["details"] is None:
+            summary["failed_extractions"] += 1
+            logger.warning(f"Failed to get details for group {group_id}")
+            return None
+        
+        details = outcome["details"]
+        summary["extracted_details"] += 1
+        
+        if outcome["members"] is not None:
+            details = details.with_item("members", outcome["members"])
+        else:
+            summary["failed_member_extractions"] += 1
+            logger.warning(f"Failed to get members for group {group_id}")
+        return details
+    
     def _extract_group_ids(self, groups_response: Dict) -> List[str]:
         """
         Extract group IDs from the groups response data
@@ -429,18 +1064,20 @@ class SuccessFactorsDataExtractor:
     
     def save_data_to_file(self, data: Dict[str, Any], filename: str = "permission_groups_data.json"):
         """Save extracted data to a JSON file"""
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Data saved to {filename}")
-            return filename
-        except Exception as e:
-            logger.error(f"Error saving data to file: {str(e)}")
-            return None
+        with span("serialization") as current:
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
+                logger.info(f"Data saved to {filename}")
+                return filename
+            except Exception as e:
+                current.fail()
+                logger.error(f"Error saving data to file: {str(e)}")
+                return None
     
     def _get_relative_page_url(self) -> str:
         """Get the relative page URL for DWR requests"""
-        current_url = self.driver.current_url
+        current_url = self.page_url or ""
         if current_url.startswith(self.base_url):
             return current_url[len(self.base_url):]
         return current_url  # fallback to full URL if not matching
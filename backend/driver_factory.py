@@ -0,0 +1,204 @@
+"""
+Chrome Driver Factory
+Resolves chromedriver once per process and keeps pre-launched Chrome instances ready for new logins
+"""
+
+import os
+import queue
+import threading
+import logging
+from typing import Optional, List, Iterable, Set
+from urllib.parse import urlparse
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from resource_blocking import ResourceBlocker
+
+logger = logging.getLogger(__name__)
+
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
+# Blocking policy shared by every browser this process launches
+resource_blocker = ResourceBlocker()
+
+
+def origin_of(url: str) -> Optional[str]:
+    """scheme://host[:port] of an http(s) URL, or None for about:blank, data: and the like"""
+    parsed = urlparse(url or "")
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def resolve_chromedriver_path() -> str:
+    """
+    Return the chromedriver binary path, resolving it only once per process
+    CHROMEDRIVER_PATH points at a local binary for offline hosts; otherwise
+    webdriver-manager looks up (and if needed downloads) the matching driver
+    """
+    global _driver_path
+    if _driver_path:
+        return _driver_path
+
+    with _driver_path_lock:
+        if not _driver_path:
+            configured = os.getenv('CHROMEDRIVER_PATH', '')
+            if configured:
+                if not os.path.isfile(configured):
+                    raise FileNotFoundError(f"CHROMEDRIVER_PATH does not exist: {configured}")
+                _driver_path = configured
+            else:
+                _driver_path = ChromeDriverManager().install()
+            logger.info(f"Using chromedriver at {_driver_path}")
+    return _driver_path
+
+
+def build_chrome_options(headless: bool) -> Options:
+    """Chrome options shared by every scraper browser"""
+    chrome_options = Options()
+
+    if headless:
+        chrome_options.add_argument('--headless')
+
+    # Performance optimizations for faster loading
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-plugins')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-sync')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+    resource_blocker.configure_options(chrome_options)
+    return chrome_options
+
+
+def create_driver(headless: bool) -> webdriver.Chrome:
+    """Launch a new Chrome with the shared chromedriver binary and the resource blocking policy"""
+    service = Service(resolve_chromedriver_path())
+    driver = webdriver.Chrome(service=service, options=build_chrome_options(headless))
+    resource_blocker.apply(driver)
+    return driver
+
+
+class DriverPool:
+    """
+    Pre-launched Chrome instances handed out to new scraper sessions
+    A background thread keeps the pool topped up; returned browsers are wiped
+    of cookies and of the storage of every origin the session visited before being reused
+    """
+
+    def __init__(self, size: Optional[int] = None, headless: Optional[bool] = None):
+        """Initialize the pool; size defaults to CHROME_POOL_SIZE and headless to HEADLESS"""
+        self.size = size if size is not None else int(os.getenv('CHROME_POOL_SIZE', '2'))
+        self.headless = headless if headless is not None else os.getenv('HEADLESS', 'False').lower() == 'true'
+        self._idle: "queue.Queue[webdriver.Chrome]" = queue.Queue()
+        self._refill = threading.Event()
+        self._stop = threading.Event()
+        self._filler: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start launching browsers in the background"""
+        if self.size <= 0 or (self._filler and self._filler.is_alive()):
+            return
+
+        # Resolve the driver up front so the first login does not pay for it
+        resolve_chromedriver_path()
+
+        self._stop.clear()
+        self._refill.set()
+        self._filler = threading.Thread(target=self._fill, name="chrome-pool-filler", daemon=True)
+        self._filler.start()
+
+    def acquire(self) -> webdriver.Chrome:
+        """Take a warm browser, or launch one if none is ready"""
+        try:
+            driver = self._idle.get_nowait()
+            logger.info("Using pre-launched Chrome from the pool")
+        except queue.Empty:
+            logger.info("Chrome pool empty, launching a new browser")
+            driver = create_driver(self.headless)
+
+        self._refill.set()
+        return driver
+
+    def release(self, driver: webdriver.Chrome, origins: Iterable[str] = ()):
+        """
+        Reset a browser and keep it for reuse, or quit it if the pool is full or the reset fails
+        origins are the origins the session visited; the storage of each is cleared
+        """
+        if self._stop.is_set() or self._idle.qsize() >= self.size or not self._reset(driver, origins):
+            self._quit(driver)
+            return
+        self._idle.put(driver)
+
+    def close(self):
+        """Stop refilling and quit every idle browser"""
+        self._stop.set()
+        self._refill.set()
+        drivers = self._drain()
+        for driver in drivers:
+            self._quit(driver)
+        logger.info(f"Closed {len(drivers)} pooled browsers")
+
+    def stats(self):
+        return {"size": self.size, "idle": self._idle.qsize()}
+
+    def _fill(self):
+        while not self._stop.is_set():
+            self._refill.wait()
+            self._refill.clear()
+            while not self._stop.is_set() and self._idle.qsize() < self.size:
+                try:
+                    self._idle.put(create_driver(self.headless))
+                    logger.info(f"Pre-launched Chrome ({self._idle.qsize()}/{self.size} ready)")
+                except Exception as e:
+                    logger.error(f"Failed to pre-launch Chrome: {str(e)}")
+                    break
+
+    def _reset(self, driver: webdriver.Chrome, origins: Iterable[str]) -> bool:
+        """Clear cookies, storage and extra tabs left by the previous session; keeps the HTTP cache"""
+        try:
+            # Whatever the open tabs still show counts as visited too
+            visited: Set[str] = {origin for origin in origins if origin}
+            handles = driver.window_handles
+            for handle in reversed(handles):
+                driver.switch_to.window(handle)
+                visited.add(origin_of(driver.current_url))
+                if handle != handles[0]:
+                    driver.close()
+            driver.switch_to.window(handles[0])
+            visited.discard(None)
+
+            driver.get("about:blank")
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in sorted(visited):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            logger.debug(f"Cleared storage of {len(visited)} origins")
+
+            # Drop the previous session's network log so its requests are not counted again
+            resource_blocker.collect_stats(driver, {})
+            return True
+
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled browser: {str(e)}")
+            return False
+
+    def _drain(self) -> List[webdriver.Chrome]:
+        drivers = []
+        while True:
+            try:
+                drivers.append(self._idle.get_nowait())
+            except queue.Empty:
+                return drivers
+
+    @staticmethod
+    def _quit(driver: webdriver.Chrome):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {str(e)}")
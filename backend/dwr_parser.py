@@ -0,0 +1,140 @@
+"""
+DWR Response Parser
+Finds dwr.engine._remoteHandleCallback payloads with plain string scanning and decodes them in place
+"""
+
+import json
+import logging
+from typing import Dict, Any, Union
+
+logger = logging.getLogger(__name__)
+
+# Use orjson when it is installed; it decodes straight from a memoryview without copying
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+    JSONDecodeError = (orjson.JSONDecodeError, json.JSONDecodeError)
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+except ImportError:
+    JSON_BACKEND = "json"
+    JSONDecodeError = (json.JSONDecodeError,)
+
+    def json_loads(data):
+        # json cannot read a memoryview, so this is the one copy the fallback makes
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+_PREFIX = "dwr.engine._remoteHandle"
+_HANDLERS = (("Callback(", "Callback"), ("Exception(", "Exception"))
+
+
+def parse_dwr_callbacks(response: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Demultiplex a DWR response into {call_id: payload}
+    Accepts the response body as bytes (preferred, decoded in place) or str.
+    Each callback line looks like dwr.engine._remoteHandleCallback('4','0',{JSON});
+    calls that raised on the server come back as _remoteHandleException and are
+    mapped to an error dict, as are payloads that are not valid JSON
+    """
+    is_bytes = isinstance(response, (bytes, bytearray))
+    if is_bytes:
+        buf = bytes(response)
+        view = memoryview(buf)
+        prefix = _PREFIX.encode('ascii')
+        handlers = tuple((marker.encode('ascii'), name) for marker, name in _HANDLERS)
+        quote, comma, newline = b"'", b",", b"\n"
+        line_breaks = (ord("\n"), ord("\r"))
+        trailing_space = (ord(" "), ord("\t"), ord("\r"))
+        semicolon, close_paren = ord(";"), ord(")")
+    else:
+        buf = response
+        view = None
+        prefix = _PREFIX
+        handlers = _HANDLERS
+        quote, comma, newline = "'", ",", "\n"
+        line_breaks = ("\n", "\r")
+        trailing_space = (" ", "\t", "\r")
+        semicolon, close_paren = ";", ")"
+
+    callbacks = {}
+    length = len(buf)
+    pos = 0
+
+    while True:
+        start = buf.find(prefix, pos)
+        if start < 0:
+            break
+
+        # Callbacks always start a line; anything else is payload text or noise
+        line_end = buf.find(newline, start)
+        if line_end < 0:
+            line_end = length
+        pos = line_end + 1
+        if start > 0 and buf[start - 1] not in line_breaks:
+            continue
+
+        cursor = start + len(prefix)
+        handler = None
+        for marker, name in handlers:
+            if buf.startswith(marker, cursor):
+                handler = name
+                cursor += len(marker)
+                break
+        if handler is None:
+            continue
+
+        # Skip the quoted batch id, then read the quoted call id
+        q1 = buf.find(quote, cursor, line_end)
+        q2 = buf.find(quote, q1 + 1, line_end) if q1 >= 0 else -1
+        q3 = buf.find(quote, q2 + 1, line_end) if q2 >= 0 else -1
+        q4 = buf.find(quote, q3 + 1, line_end) if q3 >= 0 else -1
+        separator = buf.find(comma, q4 + 1, line_end) if q4 >= 0 else -1
+        if separator < 0:
+            continue
+        call_id = buf[q3 + 1:q4]
+        if is_bytes:
+            call_id = call_id.decode('utf-8')
+
+        # The payload runs to the closing ");" at the end of the line
+        payload_start = separator + 1
+        payload_end = line_end
+        while payload_end > payload_start and buf[payload_end - 1] in trailing_space:
+            payload_end -= 1
+        if payload_end > payload_start and buf[payload_end - 1] == semicolon:
+            payload_end -= 1
+        if payload_end > payload_start and buf[payload_end - 1] == close_paren:
+            payload_end -= 1
+        else:
+            continue
+
+        payload = view[payload_start:payload_end] if is_bytes else buf[payload_start:payload_end]
+        try:
+            data = json_loads(payload)
+        except JSONDecodeError as e:
+            raw = _to_text(payload)
+            logger.error(f"Failed to parse JSON from DWR response: {str(e)}")
+            callbacks[call_id] = {"error": "Invalid JSON in DWR response", "raw": raw}
+            continue
+
+        if handler == "Exception":
+            logger.error(f"DWR call {call_id} raised an exception: {_to_text(payload)[:200]}")
+            callbacks[call_id] = {"error": "DWR exception", "raw": data}
+        else:
+            callbacks[call_id] = data
+
+    return callbacks
+
+
+def _to_text(data) -> str:
+    """Decode a payload slice for error reporting"""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, (bytes, bytearray)):
+        return data.decode('utf-8', 'replace')
+    return data
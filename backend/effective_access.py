@@ -0,0 +1,264 @@
+"""
+Effective Access Engine
+Joins group membership with role grants into each user's effective permissions and keeps them up to date incrementally
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Any, Iterable, Set
+
+from access_index import Vocabulary, bits_from_ids, iter_bits
+from models import PermissionGroup, RolePermissions, compact
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+class EffectiveAccessEngine:
+    """
+    Materialized permission set per user
+    Every set is a bitset held in a Python int: group members over user IDs, and role,
+    group and user permissions over permission IDs. A group's permissions are the OR of
+    the roles granted to it, so a user's set is the OR of a handful of group bitsets.
+    Changes are applied in batches: only users whose memberships changed, or who belong
+    to a group whose granted permissions changed, are recomputed
+    """
+
+    def __init__(self):
+        self.users = Vocabulary()
+        self.groups = Vocabulary()
+        self.roles = Vocabulary()
+        self.permissions = Vocabulary()
+
+        self._group_members: Dict[int, int] = {}
+        self._user_groups: Dict[int, Set[int]] = {}
+        # Grants listed on group details, and grants from role rules indexed by group
+        self._group_declared_roles: Dict[int, Set[int]] = {}
+        self._role_groups: Dict[int, Set[int]] = {}
+        self._granted_by_roles: Dict[int, Set[int]] = {}
+
+        self._role_bits: Dict[int, int] = {}
+        self._group_bits: Dict[int, int] = {}
+        self._effective: Dict[int, int] = {}
+
+    def apply(self, groups: Optional[Dict[str, Any]] = None, roles: Optional[Iterable[Dict[str, Any]]] = None,
+              deleted_groups: Iterable[str] = (), deleted_roles: Iterable[str] = ()) -> List[str]:
+        """
+        Apply changed groups and roles and recompute the affected users
+        Groups are group_details entries and roles are role dicts with 'permissions', as
+        records or plain dicts. A group without members, or a role without permissions,
+        failed to fetch and keeps its previous state. Returns the users whose effective
+        permissions changed
+        """
+        dirty_users = 0
+        dirty_groups: Set[int] = set()
+        changed_roles: Set[int] = set()
+
+        for group_id, group in (groups or {}).items():
+            if not isinstance(group, PermissionGroup):
+                group = compact(group, PermissionGroup)
+            gid = self.groups.add(str(group_id))
+            if 'members' in group:
+                user_ids = filter(None, (member.user_id for member in group.members))
+                dirty_users |= self._set_members(gid, bits_from_ids(map(self.users.add, user_ids)))
+            declared = {self.roles.add(role_id) for role_id in group.granted_role_ids}
+            if declared != self._group_declared_roles.get(gid, set()):
+                self._group_declared_roles[gid] = declared
+                dirty_groups.add(gid)
+
+        for group_id in deleted_groups:
+            gid = self.groups.get(str(group_id))
+            if gid is not None:
+                dirty_users |= self._set_members(gid, 0)
+                if self._group_declared_roles.pop(gid, None):
+                    dirty_groups.add(gid)
+
+        for role in roles or ():
+            permissions = role.get('permissions')
+            if not role.get('id') or not permissions:
+                continue
+            if not isinstance(permissions, RolePermissions):
+                permissions = RolePermissions.from_dict(permissions)
+            rid = self.roles.add(str(role['id']))
+            bits = bits_from_ids(
+                self.permissions.add(str(name))
+                for name in (entry.permission_id or entry.label for _category, entry in permissions.iter_permissions())
+                if name
+            )
+            granted = {self.groups.add(group_id) for group_id in permissions.granted_group_ids}
+            if bits != self._role_bits.get(rid, 0):
+                changed_roles.add(rid)
+            dirty_groups |= self._set_role(rid, bits, granted)
+
+        for role_id in deleted_roles:
+            rid = self.roles.get(str(role_id))
+            if rid is not None:
+                if rid in self._role_bits:
+                    changed_roles.add(rid)
+                dirty_groups |= self._set_role(rid, 0, set())
+
+        if changed_roles:
+            dirty_groups.update(gid for gid, rids in self._group_declared_roles.items() if rids & changed_roles)
+
+        for gid in dirty_groups:
+            bits = 0
+            for rid in self._group_declared_roles.get(gid, set()) | self._granted_by_roles.get(gid, set()):
+                bits |= self._role_bits.get(rid, 0)
+            if bits != self._group_bits.get(gid, 0):
+                self._group_bits[gid] = bits
+                dirty_users |= self._group_members.get(gid, 0)
+
+        changed = [self.users.names[uid] for uid in iter_bits(dirty_users) if self._recompute_user(uid)]
+        logger.info(f"Effective access updated: {len(changed)} users changed")
+        return changed
+
+    def apply_groups(self, groups_data: Dict[str, Any]) -> List[str]:
+        """Apply extract_all_data output, including the tombstones of an incremental run"""
+        tombstones = (groups_data.get("incremental") or {}).get("tombstones", [])
+        return self.apply(groups=groups_data.get("group_details") or {},
+                          deleted_groups=[tombstone["id"] for tombstone in tombstones])
+
+    def apply_roles(self, roles_data: Dict[str, Any]) -> List[str]:
+        """Apply the roles output ({"roles": [...]}), including the tombstones of an incremental run"""
+        tombstones = (roles_data.get("incremental") or {}).get("tombstones", [])
+        return self.apply(roles=roles_data.get("roles") or [],
+                          deleted_roles=[tombstone["id"] for tombstone in tombstones])
+
+    def effective_permissions(self, user_id: str) -> List[str]:
+        uid = self.users.get(user_id)
+        return [self.permissions.names[pid] for pid in iter_bits(self._effective.get(uid, 0))]
+
+    def has_permission(self, user_id: str, permission: str) -> bool:
+        uid, pid = self.users.get(user_id), self.permissions.get(permission)
+        if uid is None or pid is None:
+            return False
+        return bool(self._effective.get(uid, 0) >> pid & 1)
+
+    def users_with_permission(self, permission: str) -> List[str]:
+        """Users holding a permission: the OR of the member sets of every group granting it"""
+        pid = self.permissions.get(permission)
+        if pid is None:
+            return []
+        users = 0
+        for gid, bits in self._group_bits.items():
+            if bits >> pid & 1:
+                users |= self._group_members.get(gid, 0)
+        return [self.users.names[uid] for uid in iter_bits(users)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._effective),
+            "groups": len(self._group_members),
+            "roles": len(self._role_bits),
+            "permissions": len(self.permissions),
+            "grants": sum(len(group_ids) for group_ids in self._role_groups.values())
+                      + sum(len(role_ids) for role_ids in self._group_declared_roles.values()),
+            "user_permissions": sum(bin(bits).count('1') for bits in self._effective.values())
+        }
+
+    def save(self, path: str):
+        """Write the engine atomically; bitsets are stored as hex over the saved vocabularies"""
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "users": self.users.names,
+            "groups": self.groups.names,
+            "roles": self.roles.names,
+            "permissions": self.permissions.names,
+            "group_members": {str(gid): format(bits, 'x') for gid, bits in self._group_members.items()},
+            "group_roles": {str(gid): sorted(rids) for gid, rids in self._group_declared_roles.items() if rids},
+            "role_permissions": {str(rid): format(bits, 'x') for rid, bits in self._role_bits.items()},
+            "role_groups": {str(rid): sorted(gids) for rid, gids in self._role_groups.items() if gids},
+            "effective": {str(uid): format(bits, 'x') for uid, bits in self._effective.items()}
+        }
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to save effective access to {path}: {str(e)}")
+
+    @classmethod
+    def load(cls, path: str) -> 'EffectiveAccessEngine':
+        """Read a saved engine, starting empty if the file does not exist or is unreadable"""
+        engine = cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported version {snapshot.get('version')}")
+        except FileNotFoundError:
+            return engine
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable effective access snapshot {path}: {str(e)}")
+            return engine
+
+        for vocabulary, names in ((engine.users, snapshot["users"]), (engine.groups, snapshot["groups"]),
+                                  (engine.roles, snapshot["roles"]), (engine.permissions, snapshot["permissions"])):
+            for name in names:
+                vocabulary.add(name)
+
+        for gid, hex_bits in snapshot["group_members"].items():
+            engine._set_members(int(gid), int(hex_bits, 16))
+        engine._group_declared_roles = {int(gid): set(rids) for gid, rids in snapshot["group_roles"].items()}
+        for rid, hex_bits in snapshot["role_permissions"].items():
+            groups = set(snapshot["role_groups"].get(rid, ()))
+            engine._set_role(int(rid), int(hex_bits, 16), groups)
+        for gid in set(engine._group_declared_roles) | set(engine._granted_by_roles):
+            bits = 0
+            for rid in engine._group_declared_roles.get(gid, set()) | engine._granted_by_roles.get(gid, set()):
+                bits |= engine._role_bits.get(rid, 0)
+            engine._group_bits[gid] = bits
+        engine._effective = {int(uid): int(hex_bits, 16) for uid, hex_bits in snapshot["effective"].items()}
+        return engine
+
+    def _set_members(self, gid: int, members: int) -> int:
+        """Replace a group's member bitset; returns the bitset of users who joined or left"""
+        old = self._group_members.get(gid, 0)
+        moved = old ^ members
+        for uid in iter_bits(moved & members):
+            self._user_groups.setdefault(uid, set()).add(gid)
+        for uid in iter_bits(moved & old):
+            user_groups = self._user_groups[uid]
+            user_groups.discard(gid)
+            if not user_groups:
+                del self._user_groups[uid]
+        if members:
+            self._group_members[gid] = members
+        else:
+            self._group_members.pop(gid, None)
+        return moved
+
+    def _set_role(self, rid: int, bits: int, granted: Set[int]) -> Set[int]:
+        """Replace a role's permissions and the groups its rules grant it to; returns the groups to recompute"""
+        old_bits = self._role_bits.get(rid, 0)
+        old_granted = self._role_groups.get(rid, set())
+        for gid in old_granted - granted:
+            self._granted_by_roles[gid].discard(rid)
+        for gid in granted - old_granted:
+            self._granted_by_roles.setdefault(gid, set()).add(rid)
+
+        if bits:
+            self._role_bits[rid] = bits
+        else:
+            self._role_bits.pop(rid, None)
+        self._role_groups[rid] = granted
+        if bits != old_bits:
+            return old_granted | granted
+        return old_granted ^ granted
+
+    def _recompute_user(self, uid: int) -> bool:
+        """Recompute one user's permissions from their groups; returns whether they changed"""
+        bits = 0
+        for gid in self._user_groups.get(uid, ()):
+            bits |= self._group_bits.get(gid, 0)
+        if bits == self._effective.get(uid, 0):
+            return False
+        if bits:
+            self._effective[uid] = bits
+        else:
+            self._effective.pop(uid, None)
+        return True
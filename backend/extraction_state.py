@@ -0,0 +1,137 @@
+"""
+Incremental Extraction State
+Remembers each entity's lastModified and content hash so repeat runs only re-fetch what changed
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keys that carry an entity's modification time in group listings and role rows
+LAST_MODIFIED_KEYS = ['lastModified', 'lastModifiedUTC', 'lastModifiedDate', 'last_modified']
+
+# Recorded for entities whose fetch returned nothing, so they are not fetched again until their listing changes
+EMPTY_CONTENT_HASH = hashlib.sha256(b"{}").hexdigest()
+
+
+def fingerprint(entity: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Build the (lastModified, content hash) fingerprint of a listing entry
+    The hash covers the whole entry so changes that do not bump lastModified,
+    such as member counts, are still detected. Only the listing entry is hashed:
+    a group whose members were swapped without changing its member count or
+    lastModified looks unchanged until a full run
+    """
+    last_modified = next((entity[key] for key in LAST_MODIFIED_KEYS if entity.get(key)), None)
+    content = json.dumps(entity, sort_keys=True, ensure_ascii=False, default=str)
+    return {
+        "last_modified": str(last_modified) if last_modified is not None else None,
+        "hash": hashlib.sha256(content.encode('utf-8')).hexdigest()
+    }
+
+
+class ExtractionPlan:
+    """
+    Which entities of one kind are new, changed, unchanged or deleted since the last run
+    """
+
+    def __init__(self, kind: str, current: Dict[str, Dict[str, Optional[str]]],
+                 previous: Dict[str, Dict[str, Optional[str]]]):
+        self.kind = kind
+        self.fingerprints = current
+        self.new = [entity_id for entity_id in current if entity_id not in previous]
+        self.changed = [
+            entity_id for entity_id in current
+            if entity_id in previous and not _same_listing(previous[entity_id], current[entity_id])
+        ]
+        self.unchanged = [
+            entity_id for entity_id in current
+            if entity_id in previous and _same_listing(previous[entity_id], current[entity_id])
+        ]
+        self.deleted = [entity_id for entity_id in previous if entity_id not in current]
+
+    @property
+    def to_fetch(self) -> List[str]:
+        """IDs that need to be fetched again, in listing order"""
+        pending = set(self.new) | set(self.changed)
+        return [entity_id for entity_id in self.fingerprints if entity_id in pending]
+
+    def tombstones(self) -> List[Dict[str, Any]]:
+        """Deletion markers for entities that disappeared from the listing"""
+        return [{"id": entity_id, "kind": self.kind, "deleted": True} for entity_id in self.deleted]
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "unchanged": len(self.unchanged),
+            "deleted": len(self.deleted)
+        }
+
+
+class ExtractionStateStore:
+    """
+    JSON file holding {kind: {entity_id: fingerprint}} for one tenant
+    """
+
+    def __init__(self, company_id: str, state_dir: Optional[str] = None):
+        """Open the tenant's state file; the directory defaults to EXTRACTION_STATE_DIR"""
+        state_dir = state_dir or os.getenv('EXTRACTION_STATE_DIR', '.extraction_state')
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in company_id) or "default"
+        self.path = os.path.join(state_dir, f"{safe_name}.json")
+        self.state: Dict[str, Dict[str, Dict[str, Optional[str]]]] = self._load()
+
+    def plan(self, kind: str, entities: List[Tuple[str, Dict[str, Any]]]) -> ExtractionPlan:
+        """Compare the current listing, as (entity_id, listing entry) pairs, with the stored state"""
+        current = {str(entity_id): fingerprint(entry) for entity_id, entry in entities}
+        plan = ExtractionPlan(kind, current, self.state.get(kind, {}))
+        logger.info(f"Incremental {kind} plan: {plan.summary()}")
+        return plan
+
+    def commit(self, plan: ExtractionPlan, fetched_ids: List[str], empty_ids: List[str] = ()):
+        """
+        Record the entities that were fetched successfully and forget deleted ones
+        Entities that failed keep their old fingerprint, so the next run retries them.
+        Entities whose fetch came back empty are recorded with EMPTY_CONTENT_HASH, so
+        they are only fetched again once their listing entry changes
+        """
+        entries = self.state.setdefault(plan.kind, {})
+        for entity_id in fetched_ids:
+            entries[str(entity_id)] = plan.fingerprints[str(entity_id)]
+        for entity_id in empty_ids:
+            entries[str(entity_id)] = {**plan.fingerprints[str(entity_id)], "content_hash": EMPTY_CONTENT_HASH}
+        for entity_id in plan.deleted:
+            entries.pop(entity_id, None)
+        self._save()
+
+    def _load(self) -> Dict[str, Any]:
+        """Read the state file, starting empty if it does not exist or is unreadable"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable extraction state {self.path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        """Write the state file atomically so a crash never leaves it half-written"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Extraction state saved to {self.path}")
+        except Exception as e:
+            logger.error(f"Error saving extraction state: {str(e)}")
+
+
+def _same_listing(previous: Dict[str, Optional[str]], current: Dict[str, Optional[str]]) -> bool:
+    """Whether two fingerprints describe the same listing entry, ignoring what was recorded about its content"""
+    return previous.get("last_modified") == current.get("last_modified") and previous.get("hash") == current.get("hash")
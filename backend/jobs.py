@@ -0,0 +1,122 @@
+"""
+Background Extraction Jobs
+Runs long extractions on a worker pool so API requests return immediately with a job id to poll
+"""
+
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    State of one background extraction, updated by the worker and read by pollers
+    """
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+
+    def update_progress(self, **progress):
+        """Merge new progress counters; called from the worker thread"""
+        self.progress = {**self.progress, **progress}
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "error": self.error
+        }
+        if include_result and self.status == "succeeded":
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Submits extraction functions to a thread pool and tracks their jobs
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, retention: Optional[float] = None):
+        """Initialize the pool; sizes default to JOB_WORKERS and JOB_RETENTION_SECONDS"""
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', '2'))
+        self.retention = retention or float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extraction-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[Job], Any]) -> Job:
+        """
+        Queue func to run on the worker pool
+        func receives the Job so it can report progress; its return value becomes the result
+        """
+        self._prune()
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, func)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Count jobs by status"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in jobs:
+            counts[job.status] += 1
+        return counts
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running ones to finish"""
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job, func: Callable[[Job], Any]):
+        job.status = "running"
+        job.started_at = time.time()
+        logger.info(f"Started {job.kind} job {job.id}")
+
+        try:
+            job.result = func(job)
+            job.status = "succeeded"
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            logger.info(f"Finished {job.kind} job {job.id} with status {job.status}")
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
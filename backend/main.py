@@ -5,11 +5,112 @@ Simple script to test SuccessFactors login functionality
 """
 
 import os
+import json
+import argparse
+from typing import Dict, Any
 from successfactors_scraper import SuccessFactorsScraper
+from extraction_state import ExtractionStateStore
+from session_store import SessionStore
+from checkpoint_journal import CheckpointJournal
+from effective_access import EffectiveAccessEngine
+from request_governor import governor
+from telemetry import span, stage_summary
+from models import compact_role_permissions, json_default
 from dotenv import load_dotenv
 
+def fetch_permissions(scraper, extractor, roles, journal=None) -> int:
+    """
+    Fetch permissions for the given roles and return how many received some
+    Roles already in the checkpoint journal are not fetched again
+    """
+    if extractor.role_permissions_mode == "http" or scraper.driver is None:
+        # Concurrent OData calls with the captured cookies
+        return extractor.attach_role_permissions(roles, journal=journal)
+    
+    journaled = journal.completed("role_permissions") if journal else {}
+    roles_with_permissions = 0
+    for role in roles:
+        role_id = role.get('id')
+        if role_id and str(role_id) in journaled:
+            role['permissions'] = compact_role_permissions(journaled[str(role_id)])
+            roles_with_permissions += 1
+        elif role_id:
+            try:
+                permissions = scraper.fetch_role_permissions(role_id)
+                if permissions:
+                    if journal:
+                        journal.record("role_permissions", role_id, permissions)
+                    role['permissions'] = compact_role_permissions(permissions)
+                    roles_with_permissions += 1
+                    print(f"✅ Fetched permissions for role {role_id}")
+                else:
+                    role['permissions'] = {}
+                    print(f"❌ Failed to fetch permissions for role {role_id}")
+            except Exception as e:
+                print(f"💥 Error fetching permissions for role {role_id}: {str(e)}")
+                role['permissions'] = {}
+        else:
+            role['permissions'] = {}
+    return roles_with_permissions
+
+def resume_session(scraper, session_store):
+    """
+    Build an extractor from the cached session if it still authenticates
+    Returns None when there is no usable cached session and a browser login is needed
+    """
+    context = session_store.load(scraper.company_id, scraper.username, scraper.password)
+    if context is None:
+        return None
+    
+    extractor = scraper.extract_data()
+    extractor.apply_context(context)
+    if extractor.is_session_valid():
+        return extractor
+    
+    print("⌛ Cached session expired, logging in again")
+    session_store.delete(scraper.company_id, scraper.username)
+    return None
+
+def login_with_browser(scraper):
+    """Start Chrome, log in and return an extractor, or None if login failed"""
+    scraper.setup_driver()
+    
+    # Navigate to SuccessFactors
+    if not scraper.navigate_to_login():
+        print("❌ Failed to navigate to SuccessFactors")
+        return None
+    print("✅ Navigated to SuccessFactors")
+    
+    # Attempt login
+    if not scraper.login():
+        print("❌ Login failed!")
+        scraper.take_screenshot("login_failed.png")
+        return None
+    print("🎉 Login successful!")
+    
+    # Get current page info
+    page_info = scraper.get_current_page_info()
+    print(f"📄 Current page: {page_info.get('page_type', 'unknown')}")
+    print(f"🔗 URL: {page_info.get('url', 'unknown')}")
+    
+    # Take screenshot
+    screenshot = scraper.take_screenshot("login_success.png")
+    print(f"📸 Screenshot: {screenshot}")
+    
+    print("✅ Ready for automation!")
+    return scraper.extract_data()
+
 def main():
     """Main function to run the SuccessFactors scraper"""
+    parser = argparse.ArgumentParser(description="Extract permission groups and roles from SuccessFactors")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only fetch groups and roles that are new or changed since the last incremental run")
+    parser.add_argument('--fresh-login', action='store_true',
+                        help="ignore the cached session and log in through the browser")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run, skipping groups and roles already in its checkpoint journal")
+    args = parser.parse_args()
+    
     # Load environment variables
     load_dotenv()
     
@@ -19,113 +120,194 @@ def main():
         print("Please configure SF_COMPANY_ID, SF_USERNAME, and SF_PASSWORD")
         return
     
-    print("🚀 Starting SuccessFactors login...")
+    # Incremental runs compare against the tenant's stored lastModified/hash state
+    state_store = ExtractionStateStore(os.getenv('SF_COMPANY_ID')) if args.incremental else None
+    session_store = SessionStore()
     
+    scraper = SuccessFactorsScraper()
     try:
-        with SuccessFactorsScraper() as scraper:
-            # Navigate to SuccessFactors
-            if scraper.navigate_to_login():
-                print("✅ Navigated to SuccessFactors")
-                
-                # Attempt login
-                if scraper.login():
-                    print("🎉 Login successful!")
-                    
-                    # Get current page info
-                    page_info = scraper.get_current_page_info()
-                    print(f"📄 Current page: {page_info.get('page_type', 'unknown')}")
-                    print(f"🔗 URL: {page_info.get('url', 'unknown')}")
-                    
-                    # Take screenshot
-                    screenshot = scraper.take_screenshot("login_success.png")
-                    print(f"📸 Screenshot: {screenshot}")
-                    
-                    print("✅ Ready for automation!")
-                    
-                    # Extract data from SuccessFactors APIs
-                    print("\n🔍 Starting data extraction...")
-                    extractor = scraper.extract_data()
-                    
-                    if extractor:
-                        # Extract permission groups data
-                        print("📋 Fetching permission groups...")
-                        groups = extractor.get_permission_groups()
-                        
-                        if groups:
-                            print(f"✅ Found {len(groups)} permission groups")
-                            
-                            # Extract all data (groups + details)
-                            print("📊 Extracting complete data...")
-                            all_data = extractor.extract_all_data()
-                            
-                            # Save to file
-                            filename = extractor.save_data_to_file(all_data)
-                            if filename:
-                                print(f"💾 Data saved to: {filename}")
-                            
-                            print("🎊 Data extraction completed!")
-                            
-                            # Extract roles data from UI
-                            print("\n🔍 Starting roles extraction...")
-                            roles_data = scraper.extract_roles_data()
-                            
-                            if roles_data:
-                                print(f"✅ Found {len(roles_data)} roles")
-                                
-                                # Fetch permissions for each role
-                                print("🔍 Fetching permissions for each role...")
-                                roles_with_permissions = 0
-                                
-                                for role in roles_data:
-                                    role_id = role.get('id')
-                                    if role_id:
-                                        try:
-                                            permissions = scraper.fetch_role_permissions(role_id)
-                                            if permissions:
-                                                role['permissions'] = permissions
-                                                roles_with_permissions += 1
-                                                print(f"✅ Fetched permissions for role {role_id}")
-                                            else:
-                                                role['permissions'] = {}
-                                                print(f"❌ Failed to fetch permissions for role {role_id}")
-                                        except Exception as e:
-                                            print(f"💥 Error fetching permissions for role {role_id}: {str(e)}")
-                                            role['permissions'] = {}
-                                    else:
-                                        role['permissions'] = {}
-                                
-                                print(f"🎊 Permissions fetched for {roles_with_permissions}/{len(roles_data)} roles")
-                                
-                                # Save roles data to file
-                                import json
-                                roles_filename = "roles_data.json"
-                                with open(roles_filename, 'w', encoding='utf-8') as f:
-                                    json.dump({
-                                        "roles": roles_data,
-                                        "summary": {
-                                            "total_roles": len(roles_data),
-                                            "roles_with_permissions": roles_with_permissions
-                                        }
-                                    }, f, indent=2, ensure_ascii=False)
-                                
-                                print(f"💾 Roles data saved to: {roles_filename}")
-                                print("🎊 Roles extraction completed!")
-                            else:
-                                print("❌ Failed to extract roles data")
-                        
-                        else:
-                            print("❌ Failed to fetch permission groups")
-                    else:
-                        print("❌ Failed to create data extractor")
-                    
-                else:
-                    print("❌ Login failed!")
-                    scraper.take_screenshot("login_failed.png")
-            else:
-                print("❌ Failed to navigate to SuccessFactors")
-                
+        run(scraper, state_store, session_store, fresh_login=args.fresh_login, resume=args.resume)
     except Exception as e:
         print(f"💥 Error: {str(e)}")
+    finally:
+        scraper.close()
+
+def run(scraper, state_store, session_store, fresh_login: bool = False, resume: bool = False) -> Dict[str, Any]:
+    """
+    Log in (or resume the cached session), then extract groups and roles for the scraper's tenant
+    Completed groups and roles are journaled as they finish; with resume, those already
+    journaled by an interrupted run are skipped. The journal is removed once a run succeeds.
+    Returns a summary of the run; output files are written to the current directory
+    """
+    result = {"status": "failed", "resumed_session": False}
+    
+    extractor = None if fresh_login else resume_session(scraper, session_store)
+    if extractor:
+        print("♻️  Reusing cached session, skipping browser login")
+        result["resumed_session"] = True
+    else:
+        print("🚀 Starting SuccessFactors login...")
+        extractor = login_with_browser(scraper)
+    
+    if not extractor:
+        print("❌ Failed to create data extractor")
+        result["error"] = "Login failed"
+        return result
+    
+    # Extract data from SuccessFactors APIs
+    print("\n🔍 Starting data extraction...")
+    
+    # Extract permission groups data
+    print("📋 Fetching permission groups...")
+    groups = extractor.get_permission_groups()
+    
+    if not groups:
+        print("❌ Failed to fetch permission groups")
+        result["error"] = "Failed to fetch permission groups"
+        return result
+    
+    print(f"✅ Found {len(groups)} permission groups")
+    
+    # The session works, so the next run can skip the browser
+    session_store.save(scraper.company_id, scraper.username, scraper.password, extractor.context)
+    
+    journal = CheckpointJournal(scraper.company_id, resume=resume)
+    if resume:
+        print(f"⏯️  Resuming from checkpoint: {journal.path}")
+    access_path = effective_access_path(state_store)
+    access = EffectiveAccessEngine.load(access_path) if state_store else EffectiveAccessEngine()
+    if state_store and state_store.state and not os.path.exists(access_path):
+        print(f"⚠️  No effective access at {access_path}; it will only cover groups and roles fetched from now on")
+    try:
+        result["groups"] = extract_groups(extractor, state_store, journal, access)
+        result["roles"] = extract_roles(scraper, extractor, state_store, journal, access)
+        # A failed or incomplete groups stage keeps the run partial, so its journal is kept for --resume
+        groups_complete = result["groups"] is not None and not result["groups"].get("failures")
+        result["status"] = "success" if groups_complete and result["roles"] is not None else "partial"
+    finally:
+        # Keep the journal for --resume unless everything was extracted
+        journal.close(remove=result["status"] == "success")
+        # Incremental runs apply deltas to this file, so it is saved even after a partial run
+        access.save(access_path)
+    result["effective_access"] = access.stats()
+    print(f"🔐 Effective access: {result['effective_access']['users']} users, saved to {access_path}")
+    result["requests"] = governor.metrics()
+    result["timings"] = stage_summary()
+    return result
+
+
+def effective_access_path(state_store) -> str:
+    """
+    Where the effective access engine is saved
+    Incremental runs keep it next to the extraction state it has to stay in step with;
+    full runs write it to the current directory with the other output files
+    """
+    if state_store:
+        return f"{os.path.splitext(state_store.path)[0]}.access.json"
+    return "effective_access.json"
+
+
+def extract_groups(extractor, state_store, journal=None, access=None):
+    """Extract every group's details and members, save them and return the extraction summary"""
+    # Extract all data (groups + details)
+    print("📊 Extracting complete data...")
+    all_data = extractor.extract_all_data(state_store=state_store, journal=journal)
+    
+    checkpoint = all_data.get("checkpoint", {})
+    if checkpoint.get("resumed_groups"):
+        print(f"⏯️  Reused {checkpoint['resumed_groups']} groups from the checkpoint")
+    
+    if state_store:
+        incremental = all_data.get("incremental", {})
+        print(f"🔁 Groups: {incremental.get('summary')}")
+    
+    # Save to file
+    groups_filename = "permission_groups_delta.json" if state_store else "permission_groups_data.json"
+    filename = extractor.save_data_to_file(all_data, groups_filename)
+    if filename:
+        print(f"💾 Data saved to: {filename}")
+    
+    if access is not None and "error" not in all_data:
+        changed_users = access.apply_groups(all_data)
+        print(f"🔐 Effective permissions changed for {len(changed_users)} users")
+    
+    print("🎊 Data extraction completed!")
+    return all_data.get("summary")
+
+def extract_roles(scraper, extractor, state_store, journal=None, access=None):
+    """Extract roles with their permissions, save them and return the roles summary (None on failure)"""
+    # Extract roles data from UI or OData
+    print("\n🔍 Starting roles extraction...")
+    
+    # A resumed session has no browser, so roles come from OData
+    use_odata = extractor.roles_source == "odata" or scraper.driver is None
+    if use_odata:
+        # Role list and permissions come back together from a few OData pages,
+        # unless an incremental run only needs permissions for changed roles
+        roles_data = extractor.list_roles(expand_categories=state_store is None)
+    else:
+        roles_data = scraper.extract_roles_data()
+    
+    if not roles_data:
+        print("❌ Failed to extract roles data")
+        return None
+    
+    print(f"✅ Found {len(roles_data)} roles")
+    
+    roles_to_fetch = roles_data
+    roles_plan = None
+    if state_store:
+        roles_plan = state_store.plan(
+            "roles", [(role['id'], role) for role in roles_data if role.get('id')]
+        )
+        pending = set(roles_plan.to_fetch)
+        roles_to_fetch = [role for role in roles_data if role.get('id') in pending]
+        print(f"🔁 Roles: {roles_plan.summary()}")
+    
+    # Fetch permissions for each role
+    print("🔍 Fetching permissions for each role...")
+    
+    if use_odata and state_store is None:
+        roles_with_permissions = sum(1 for role in roles_data if role.get('permissions'))
+    else:
+        roles_with_permissions = fetch_permissions(scraper, extractor, roles_to_fetch, journal)
+    
+    print(f"🎊 Permissions fetched for {roles_with_permissions}/{len(roles_to_fetch)} roles")
+    
+    # Save roles data to file
+    roles_output = {
+        "roles": roles_to_fetch,
+        "summary": {
+            "total_roles": len(roles_data),
+            "roles_with_permissions": roles_with_permissions
+        }
+    }
+    roles_filename = "roles_data.json"
+    if roles_plan:
+        roles_filename = "roles_delta.json"
+        roles_output["incremental"] = {
+            "summary": roles_plan.summary(),
+            "unchanged_roles": roles_plan.unchanged,
+            "tombstones": roles_plan.tombstones()
+        }
+        # Roles whose fetch came back empty are recorded as such instead of being fetched on every run
+        state_store.commit(roles_plan, [role['id'] for role in roles_to_fetch if role.get('permissions')],
+                           [role['id'] for role in roles_to_fetch if not role.get('permissions')])
+    
+    with span("serialization"), open(roles_filename, 'w', encoding='utf-8') as f:
+        json.dump(roles_output, f, indent=2, ensure_ascii=False, default=json_default)
+    
+    print(f"💾 Roles data saved to: {roles_filename}")
+    
+    if access is not None:
+        changed_users = access.apply_roles(roles_output)
+        print(f"🔐 Effective permissions changed for {len(changed_users)} users")
+        granting = sum(1 for role in roles_to_fetch if getattr(role.get('permissions'), 'granted_group_ids', ()))
+        if roles_with_permissions and not granting:
+            # Grants come from the roles' expanded rules; without them every user's effective access is empty
+            print("⚠️  No fetched role grants any permission group; check that role rules are returned")
+    print("🎊 Roles extraction completed!")
+    return roles_output["summary"]
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,330 @@
+"""
+Compact Extraction Model
+Slotted, string-interned records for permission groups, members, roles and permissions that serialize back to the raw JSON shape
+"""
+
+import sys
+import threading
+from typing import Dict, Optional, Any, Iterator, Tuple
+
+# Strings up to this length are interned; labels, IDs, departments and statuses repeat
+# thousands of times across members and permissions, long free text rarely does
+INTERN_MAX_LENGTH = 128
+
+# Member list keys of a getGroupMembers response, in the order the extractor looks for them
+MEMBER_LIST_KEYS = ('memberList', 'members', 'userList', 'groupMembers', 'resultList')
+
+# Where a role's grants (rules) and each grant's access groups are found, in order of preference
+GRANT_LIST_KEYS = ('rules', 'roleRules', 'grants', 'assignments')
+GRANT_GROUP_KEYS = ('accessGroups', 'grantedGroups', 'groups', 'accessGroupIds', 'groupIds')
+# $expand for fetching a role's permissions; rules and their access groups are navigation properties,
+# so without expanding them the role's grants to groups are never returned
+ROLE_PERMISSIONS_EXPAND = "categories,rules($expand=accessGroups)"
+# Roles listed on a group's retrieveGroup details, if the tenant returns them
+GROUP_ROLE_KEYS = ('roles', 'grantedRoles', 'roleList', 'permissionRoles')
+
+_key_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_key_tuples_lock = threading.Lock()
+
+
+def _shared_keys(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Return the one shared instance of this key tuple, so records of the same shape share their keys"""
+    shared = _key_tuples.get(keys)
+    if shared is None:
+        with _key_tuples_lock:
+            shared = _key_tuples.get(keys)
+            if shared is None:
+                shared = tuple(sys.intern(key) for key in keys)
+                _key_tuples[shared] = shared
+    return shared
+
+
+def compact(value: Any, record_type: Optional[type] = None) -> Any:
+    """
+    Convert a decoded JSON value into its compact form
+    Objects become records (of record_type if given), arrays become tuples and short strings are interned
+    """
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+    if isinstance(value, dict):
+        return (record_type or Record).from_dict(value)
+    if isinstance(value, list):
+        return tuple(compact(item, record_type) for item in value)
+    return value
+
+
+def expand(value: Any) -> Any:
+    """Convert a compact value back into plain dicts and lists"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [expand(item) for item in value]
+    if isinstance(value, dict):
+        return {key: expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item) for item in value]
+    return value
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dump(default=...) hook for records
+    Returns a shallow dict, so nested records are expanded one level at a time while encoding
+    instead of materializing the whole raw document first
+    """
+    if isinstance(value, Record):
+        return dict(zip(value._keys, value._values))
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class Record:
+    """
+    Immutable JSON object stored as a shared key tuple and a value tuple
+    Read it like a dict (record['key'], record.get('key'), 'key' in record);
+    to_dict() returns the original object with keys in their original order.
+    Subclasses map keys holding nested objects to typed records in CHILD_TYPES
+    """
+
+    __slots__ = ('_keys', '_values')
+
+    CHILD_TYPES: Dict[str, type] = {}
+
+    def __init__(self, keys: Tuple[str, ...], values: Tuple[Any, ...]):
+        self._keys = keys
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Record':
+        child_types = cls.CHILD_TYPES
+        return cls(
+            _shared_keys(tuple(data)),
+            tuple(compact(value, child_types.get(key)) for key, value in data.items())
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: expand(value) for key, value in zip(self._keys, self._values)}
+
+    def with_item(self, key: str, value: Any) -> 'Record':
+        """Copy of the record with key set to value, appended after the existing keys if it is new"""
+        value = compact(value, self.CHILD_TYPES.get(key))
+        if key in self._keys:
+            index = self._keys.index(key)
+            return type(self)(self._keys, self._values[:index] + (value,) + self._values[index + 1:])
+        return type(self)(_shared_keys(self._keys + (key,)), self._values + (value,))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            return default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._keys, self._values)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            return self._keys == other._keys and self._values == other._values
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Member(Record):
+    """One user of a permission group"""
+
+    __slots__ = ()
+
+    @property
+    def user_id(self) -> Optional[str]:
+        # Hot path when indexing memberships, so no generator
+        for key in ('userId', 'userName', 'username', 'id'):
+            value = self.get(key)
+            if value:
+                return value
+        return None
+
+
+class MemberPage(Record):
+    """A getGroupMembers response whose member list holds Member records"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MemberPage':
+        list_key = cls._list_key(data)
+        return cls(
+            _shared_keys(tuple(data)),
+            tuple(compact(value, Member if key == list_key else None) for key, value in data.items())
+        )
+
+    @property
+    def members(self) -> Tuple[Member, ...]:
+        list_key = self._list_key(self)
+        return self[list_key] if list_key else ()
+
+    @staticmethod
+    def _list_key(data) -> Optional[str]:
+        for key in MEMBER_LIST_KEYS:
+            if isinstance(data.get(key), (list, tuple)):
+                return key
+        return next((key for key in data.keys() if isinstance(data.get(key), (list, tuple))), None)
+
+
+class PermissionGroup(Record):
+    """retrieveGroup details of one permission group, with its getGroupMembers response under 'members'"""
+
+    __slots__ = ()
+
+    CHILD_TYPES = {'members': MemberPage}
+
+    @property
+    def group_id(self) -> Optional[str]:
+        group_id = self.get('groupId')
+        return str(group_id) if group_id is not None else None
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.get('groupName')
+
+    @property
+    def members(self) -> Tuple[Member, ...]:
+        page = self.get('members')
+        return page.members if isinstance(page, MemberPage) else ()
+
+    @property
+    def granted_role_ids(self) -> Tuple[str, ...]:
+        """IDs of roles the details say are granted to this group; usually empty, grants live on roles"""
+        roles = next((self[key] for key in GROUP_ROLE_KEYS if isinstance(self.get(key), tuple)), ())
+        return tuple(_entity_ids(roles, ('roleId', 'id')))
+
+
+class PermissionEntry(Record):
+    """One permission granted within a role category"""
+
+    __slots__ = ()
+
+    @property
+    def permission_id(self) -> Optional[str]:
+        return next((self[key] for key in ('permissionId', 'id', 'permissionStringValue') if self.get(key)), None)
+
+    @property
+    def label(self) -> Optional[str]:
+        return next((self[key] for key in ('permissionLabel', 'label', 'name') if self.get(key)), None)
+
+
+class PermissionCategory(Record):
+    """A role permission category; its list of permission objects holds PermissionEntry records"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PermissionCategory':
+        list_key = cls._list_key(data)
+        return cls(
+            _shared_keys(tuple(data)),
+            tuple(compact(value, PermissionEntry if key == list_key else None) for key, value in data.items())
+        )
+
+    @property
+    def label(self) -> Optional[str]:
+        return next((self[key] for key in ('categoryLabel', 'label', 'name', 'categoryId') if self.get(key)), None)
+
+    @property
+    def permissions(self) -> Tuple[PermissionEntry, ...]:
+        list_key = self._list_key(self)
+        return self[list_key] if list_key else ()
+
+    @staticmethod
+    def _list_key(data) -> Optional[str]:
+        """First key holding a list of objects; that list is the category's permissions"""
+        for key in data.keys():
+            value = data.get(key)
+            if isinstance(value, (list, tuple)) and value and isinstance(value[0], (dict, Record)):
+                return key
+        return None
+
+
+class RolePermissions(Record):
+    """PermissionRoleEntity expanded with its categories, as stored under role['permissions']"""
+
+    __slots__ = ()
+
+    CHILD_TYPES = {'categories': PermissionCategory}
+
+    @property
+    def categories(self) -> Tuple[PermissionCategory, ...]:
+        categories = self.get('categories')
+        return categories if isinstance(categories, tuple) else ()
+
+    def iter_permissions(self) -> Iterator[Tuple[PermissionCategory, PermissionEntry]]:
+        """Every (category, permission) pair granted by the role"""
+        for category in self.categories:
+            for permission in category.permissions:
+                yield category, permission
+
+    @property
+    def granted_group_ids(self) -> Tuple[str, ...]:
+        """IDs of the permission groups the role's rules grant it to"""
+        grants = next((self[key] for key in GRANT_LIST_KEYS if isinstance(self.get(key), tuple)), ())
+        group_ids = []
+        for grant in grants:
+            if not isinstance(grant, Record):
+                continue
+            groups = next((grant[key] for key in GRANT_GROUP_KEYS if isinstance(grant.get(key), tuple)), ())
+            group_ids.extend(_entity_ids(groups, ('groupId', 'id')))
+        return tuple(dict.fromkeys(group_ids))
+
+
+class Role(Record):
+    """A role list entry (id, name, user_type, ...), with RolePermissions under 'permissions' once fetched"""
+
+    __slots__ = ()
+
+    CHILD_TYPES = {'permissions': RolePermissions}
+
+    @property
+    def role_id(self) -> Optional[str]:
+        return self.get('id')
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.get('name')
+
+
+def _entity_ids(entities: Tuple[Any, ...], id_keys: Tuple[str, ...]) -> Iterator[str]:
+    """IDs of a list of referenced entities, given either as objects or as bare IDs"""
+    for entity in entities:
+        if isinstance(entity, Record):
+            entity = next((entity[key] for key in id_keys if entity.get(key) is not None), None)
+        if entity is not None and not isinstance(entity, (Record, tuple)):
+            yield str(entity)
+
+
+def compact_role_permissions(permissions: Any) -> Any:
+    """RolePermissions for a fetched PermissionRoleEntity; empty results are returned unchanged"""
+    if isinstance(permissions, dict) and permissions:
+        return RolePermissions.from_dict(permissions)
+    return permissions
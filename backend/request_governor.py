@@ -0,0 +1,327 @@
+"""
+SuccessFactors Request Governor
+Throttles, retries and circuit-breaks every outbound call, adapting the request rate to 429/5xx responses
+"""
+
+import os
+import re
+import time
+import random
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Any, Callable
+from urllib.parse import urlparse
+from telemetry import REQUEST_SECONDS, REQUEST_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean "slow down" and are retried
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a host has failed repeatedly and calls to it are being short-circuited"""
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate adapts with AIMD: it grows additively on success
+    and is cut multiplicatively when the server throttles or fails
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float,
+                 increase: float = 0.1, decrease: float = 0.5):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # Drain the burst so the slowdown takes effect immediately
+            self._tokens = min(self._tokens, 0)
+
+
+class CircuitBreaker:
+    """
+    Opens after threshold consecutive failures and rejects calls for cooldown seconds,
+    then lets a single probe through (half-open) to decide whether to close again
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold and (self.opened_at is None or self.state != "open"):
+                self.opened_at = time.monotonic()
+                logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+
+    def record_neutral(self):
+        """End a call that says nothing about the host's health, such as a throttled one; ends a half-open probe"""
+        with self._lock:
+            self._probing = False
+
+
+class EndpointMetrics:
+    """Counters and latency for one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttled = 0
+        self.circuit_rejections = 0
+        self.statuses: Dict[str, int] = {}
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, status: str, latency: float):
+        """Count one attempt and its latency"""
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def count(self, counter: str):
+        """Increment one of successes, failures, retries, throttled or circuit_rejections"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "circuit_rejections": self.circuit_rejections,
+                "statuses": dict(self.statuses),
+                "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 1)
+            }
+
+
+class RequestGovernor:
+    """
+    Process-wide gate for SuccessFactors calls
+    Each host gets its own token bucket and circuit breaker; metrics are kept per endpoint
+    """
+
+    def __init__(self):
+        """Initialize the governor; limits default to the REQUEST_* and CIRCUIT_* environment variables"""
+        self.rate = float(os.getenv('REQUEST_RATE', '10'))
+        self.min_rate = float(os.getenv('REQUEST_RATE_MIN', '0.5'))
+        self.max_rate = float(os.getenv('REQUEST_RATE_MAX', '50'))
+        self.burst = float(os.getenv('REQUEST_BURST', '10'))
+        self.max_retries = int(os.getenv('REQUEST_MAX_RETRIES', '4'))
+        self.backoff_base = float(os.getenv('REQUEST_BACKOFF_BASE', '0.5'))
+        self.backoff_max = float(os.getenv('REQUEST_BACKOFF_MAX', '30'))
+        self.circuit_threshold = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '10'))
+        self.circuit_cooldown = float(os.getenv('CIRCUIT_COOLDOWN', '30'))
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._metrics: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def send(self, session, method: str, url: str, **kwargs):
+        """Send an HTTP request through the session under the governor's policy"""
+        return self.execute(method, url, lambda: session.request(method, url, **kwargs))
+
+    def execute(self, method: str, url: str, attempt: Callable[[], Any]):
+        """
+        Run attempt() with throttling, retries and the host's circuit breaker
+        attempt returns a response-like object with status_code and headers. Retryable
+        statuses and connection errors are retried with jittered exponential backoff,
+        honoring Retry-After; the last response is returned once retries run out.
+        The circuit breaker counts one outcome per call, after its retries; throttling
+        is left to the token bucket and never counts as a failure.
+        Raises CircuitOpenError if the host's circuit is open
+        """
+        host = urlparse(url).netloc
+        endpoint = self._endpoint(url)
+        bucket, breaker = self._host_state(host)
+        metrics = self._endpoint_metrics(method, url)
+
+        if not breaker.allow():
+            metrics.count("circuit_rejections")
+            REQUEST_EVENTS.inc(method=method, endpoint=endpoint, event="circuit_rejection")
+            raise CircuitOpenError(f"Circuit open for {host}, retry in {self.circuit_cooldown:.0f}s")
+
+        for attempt_number in range(self.max_retries + 1):
+            bucket.acquire()
+            start = time.monotonic()
+            try:
+                response = attempt()
+            except Exception as e:
+                metrics.record("error", time.monotonic() - start)
+                REQUEST_SECONDS.observe(time.monotonic() - start, method=method, endpoint=endpoint, status="error")
+                transient = self._is_transient(e)
+                if attempt_number == self.max_retries or not transient:
+                    metrics.count("failures")
+                    if transient:
+                        breaker.record(False)
+                    else:
+                        breaker.record_neutral()
+                    raise
+                delay = self._backoff(attempt_number)
+                logger.warning(f"{method} {endpoint} failed ({str(e)}), retrying in {delay:.1f}s")
+                metrics.count("retries")
+                REQUEST_EVENTS.inc(method=method, endpoint=endpoint, event="retry")
+                time.sleep(delay)
+                continue
+
+            status = response.status_code
+            metrics.record(str(status), time.monotonic() - start)
+            REQUEST_SECONDS.observe(time.monotonic() - start, method=method, endpoint=endpoint, status=status)
+
+            if status not in RETRY_STATUSES:
+                # A 4xx is the caller's problem, not a sign the host is struggling
+                bucket.on_success()
+                breaker.record(True)
+                metrics.count("successes" if status < 400 else "failures")
+                return response
+
+            throttled = status in THROTTLE_STATUSES
+            if throttled:
+                metrics.count("throttled")
+                REQUEST_EVENTS.inc(method=method, endpoint=endpoint, event="throttled")
+            bucket.on_throttle()
+
+            if attempt_number == self.max_retries:
+                metrics.count("failures")
+                if throttled:
+                    breaker.record_neutral()
+                else:
+                    breaker.record(False)
+                return response
+
+            delay = max(self._backoff(attempt_number), self._retry_after(response))
+            logger.warning(f"{method} {endpoint} returned HTTP {status}, retrying in {delay:.1f}s "
+                           f"(rate now {bucket.rate:.1f}/s)")
+            metrics.count("retries")
+            REQUEST_EVENTS.inc(method=method, endpoint=endpoint, event="retry")
+            time.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-endpoint counters plus each host's current rate and circuit state"""
+        with self._lock:
+            endpoints = {name: m.to_dict() for name, m in self._metrics.items()}
+            hosts = {
+                host: {
+                    "rate": round(self._buckets[host].rate, 2),
+                    "circuit": self._breakers[host].state,
+                    "consecutive_failures": self._breakers[host].failures
+                }
+                for host in self._buckets
+            }
+        return {"endpoints": endpoints, "hosts": hosts}
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst, self.min_rate, self.max_rate)
+                self._breakers[host] = CircuitBreaker(self.circuit_threshold, self.circuit_cooldown)
+            return self._buckets[host], self._breakers[host]
+
+    def _endpoint_metrics(self, method: str, url: str) -> EndpointMetrics:
+        name = f"{method} {self._endpoint(url)}"
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = EndpointMetrics()
+            return self._metrics[name]
+
+    @staticmethod
+    def _endpoint(url: str) -> str:
+        """Endpoint name with entity keys and batch sizes folded, e.g. PermissionRoleEntity({id})"""
+        path = urlparse(url).path
+        path = re.sub(r"\([^)]*\)", "({id})", path)
+        path = re.sub(r"Multiple\.\d+\.dwr$", "Multiple.{n}.dwr", path)
+        return path.rsplit("/", 1)[-1] or path
+
+    def _backoff(self, attempt_number: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt_number)))
+
+    def _retry_after(self, response) -> float:
+        """Seconds requested by a Retry-After header, given as seconds or an HTTP date"""
+        value = (response.headers or {}).get("Retry-After")
+        if not value:
+            return 0.0
+        try:
+            return min(self.backoff_max, max(0.0, float(value)))
+        except ValueError:
+            pass
+        try:
+            return min(self.backoff_max, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+        except Exception:
+            return 0.0
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Connection resets and timeouts are retried; anything else is a bug or a bad request"""
+        name = type(error).__name__
+        return isinstance(error, (ConnectionError, TimeoutError)) or name in (
+            "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError"
+        )
+
+
+# Shared by every extractor and scraper in the process so one tenant host sees one request rate
+governor = RequestGovernor()
@@ -0,0 +1,117 @@
+"""
+Resource Blocking
+Blocks images, fonts, media and analytics requests in Chrome through the DevTools Protocol
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Network.setBlockedURLs only matches URLs, so resource types map to file extension patterns
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.svg*', '*.webp*', '*.ico*', '*.bmp*'],
+    'font': ['*.woff*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.wav*', '*.ogg*'],
+    'stylesheet': ['*.css*']
+}
+
+DEFAULT_BLOCKED_TYPES = 'image,font,media'
+DEFAULT_BLOCKED_URL_PATTERNS = '*google-analytics.com*,*googletagmanager.com*,*doubleclick.net*,*hotjar.com*,*newrelic.com*,*nr-data.net*'
+
+
+class ResourceBlocker:
+    """
+    Resource blocking policy applied to every scraper browser
+    Blocked requests are counted from Chrome's performance log. Blocked responses
+    are never downloaded, so their size is unknown; the stats report the bytes
+    that were still transferred so runs with and without blocking can be compared
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, resource_types: Optional[List[str]] = None,
+                 url_patterns: Optional[List[str]] = None):
+        """Initialize the policy; settings default to the BLOCK_* environment variables"""
+        if enabled is None:
+            enabled = os.getenv('BLOCK_RESOURCES', 'False').lower() == 'true'
+        if resource_types is None:
+            resource_types = self._split(os.getenv('BLOCK_RESOURCE_TYPES', DEFAULT_BLOCKED_TYPES))
+        if url_patterns is None:
+            url_patterns = self._split(os.getenv('BLOCK_URL_PATTERNS', DEFAULT_BLOCKED_URL_PATTERNS))
+
+        self.enabled = enabled
+        self.resource_types = [t.lower() for t in resource_types]
+        self.url_patterns = list(url_patterns)
+
+        unknown = [t for t in self.resource_types if t not in RESOURCE_TYPE_PATTERNS]
+        if unknown:
+            logger.warning(f"Ignoring unknown blocked resource types: {', '.join(unknown)}")
+
+    @property
+    def patterns(self) -> List[str]:
+        """Every URL pattern passed to Network.setBlockedURLs"""
+        patterns = []
+        for resource_type in self.resource_types:
+            patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+        patterns.extend(self.url_patterns)
+        return patterns
+
+    def configure_options(self, chrome_options):
+        """Turn on the performance log the blocking counters are read from"""
+        if self.enabled:
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    def apply(self, driver):
+        """Install the blocked URL patterns on the browser's current tab"""
+        if not self.enabled:
+            return
+
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
+            logger.info(f"Blocking {len(self.patterns)} URL patterns ({', '.join(self.resource_types)} and analytics)")
+        except Exception as e:
+            logger.warning(f"Failed to enable resource blocking: {str(e)}")
+
+    def collect_stats(self, driver, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Drain the performance log and add its request counters to stats
+        stats holds requests, blocked_requests, blocked_by_type and transferred_bytes
+        """
+        stats.setdefault("requests", 0)
+        stats.setdefault("blocked_requests", 0)
+        stats.setdefault("blocked_by_type", {})
+        stats.setdefault("transferred_bytes", 0)
+
+        if not self.enabled:
+            return stats
+
+        try:
+            entries = driver.get_log('performance')
+        except Exception as e:
+            logger.warning(f"Failed to read performance log: {str(e)}")
+            return stats
+
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError, TypeError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                stats["requests"] += 1
+            elif method == 'Network.loadingFinished':
+                stats["transferred_bytes"] += int(params.get('encodedDataLength', 0))
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                stats["blocked_requests"] += 1
+                resource_type = params.get('type', 'Other')
+                stats["blocked_by_type"][resource_type] = stats["blocked_by_type"].get(resource_type, 0) + 1
+
+        return stats
+
+    @staticmethod
+    def _split(value: str) -> List[str]:
+        return [item.strip() for item in value.split(',') if item.strip()]
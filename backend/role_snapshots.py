@@ -0,0 +1,93 @@
+"""
+Role List Snapshot Cache
+Keeps each tenant's role list for a short TTL so paging through /roles-data does not re-scrape every role
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+from models import Role, json_default
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(Exception):
+    """Raised when a paging cursor is malformed or refers to a snapshot that no longer exists"""
+
+
+class RoleSnapshot:
+    """
+    An immutable role list captured at one point in time
+    """
+
+    def __init__(self, roles: List[Dict[str, Any]]):
+        # Permissions are fetched per page, so the snapshot only keeps the list fields, as compact records
+        self.roles = [Role.from_dict({k: v for k, v in role.items() if k != 'permissions'}) for role in roles]
+        self.created_at = time.time()
+        self.etag = hashlib.sha256(
+            json.dumps(self.roles, sort_keys=True, ensure_ascii=False, default=json_default).encode('utf-8')
+        ).hexdigest()[:32]
+
+    def page(self, offset: int, page_size: int) -> List[Dict[str, Any]]:
+        """Return copies of one page of roles, safe for the caller to attach permissions to"""
+        return [role.to_dict() for role in self.roles[offset:offset + page_size]]
+
+    def encode_cursor(self, offset: int) -> str:
+        """Build an opaque cursor pointing at offset within this snapshot"""
+        payload = json.dumps({"etag": self.etag, "offset": offset}).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+class RoleSnapshotCache:
+    """
+    Per-tenant role list snapshots with a TTL
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        """Initialize the cache; the TTL defaults to ROLE_SNAPSHOT_TTL seconds"""
+        self.ttl = ttl or float(os.getenv('ROLE_SNAPSHOT_TTL', '300'))
+        self._snapshots: Dict[Tuple[str, str], RoleSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[RoleSnapshot]:
+        """Return the tenant's snapshot if it has not expired"""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and time.time() - snapshot.created_at > self.ttl:
+                del self._snapshots[key]
+                snapshot = None
+        return snapshot
+
+    def put(self, key: Tuple[str, str], roles: List[Dict[str, Any]]) -> RoleSnapshot:
+        """Store a fresh snapshot of the tenant's role list"""
+        snapshot = RoleSnapshot(roles)
+        with self._lock:
+            self._snapshots[key] = snapshot
+        logger.info(f"Cached role snapshot {snapshot.etag} with {len(snapshot.roles)} roles")
+        return snapshot
+
+    def invalidate(self, key: Tuple[str, str]):
+        """Drop the tenant's snapshot so the next request lists roles again"""
+        with self._lock:
+            self._snapshots.pop(key, None)
+
+    def expires_in(self, snapshot: RoleSnapshot) -> float:
+        """Seconds until the snapshot expires"""
+        return max(0.0, self.ttl - (time.time() - snapshot.created_at))
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """Decode a cursor into (etag, offset); raises InvalidCursorError if malformed"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            offset = int(payload["offset"])
+            if offset < 0:
+                raise ValueError("negative offset")
+            return str(payload["etag"]), offset
+        except Exception as e:
+            raise InvalidCursorError(f"Invalid cursor: {str(e)}")
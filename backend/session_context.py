@@ -0,0 +1,133 @@
+"""
+SuccessFactors Session Context
+Immutable snapshot of the cookies and tokens captured from an authenticated browser page
+"""
+
+import re
+import time
+import logging
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Dict, Optional, Any, Mapping
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# One case-insensitive pass over the page source finds every token candidate.
+# Longer names come first so "csrfToken" is not read as "token"
+_TOKEN_PATTERN = re.compile(
+    r'(csrfToken|_csrf|csrf|scriptSessionId|sessionId|token)["\']?\s*[:=]\s*["\']([^"\']+)["\']',
+    re.IGNORECASE
+)
+
+# Page source keys in order of preference
+CSRF_KEYS = ('csrftoken', '_csrf', 'csrf', 'token')
+SESSION_KEYS = ('sessionid', 'scriptsessionid')
+
+SESSION_COOKIES = ('JSESSIONID', 'sessionId', 'sid')
+CSRF_URL_PARAMS = ('_s.crb', 'csrf', 'token')
+
+
+def scan_page_tokens(page_source: str) -> Dict[str, str]:
+    """
+    Return the first value of each token key found in the page source
+    CSRF candidates of 10 characters or fewer are skipped; real tokens are longer
+    """
+    tokens = {}
+    for match in _TOKEN_PATTERN.finditer(page_source):
+        key, value = match.group(1).lower(), match.group(2)
+        if key in tokens:
+            continue
+        if key in CSRF_KEYS and len(value) <= 10:
+            continue
+        tokens[key] = value
+    return tokens
+
+
+@dataclass(frozen=True)
+class SessionContext:
+    """
+    Cookies, CSRF token, scriptSessionId and page URL of one logged-in session
+    Extractors swap in a new context instead of mutating this one, so worker
+    threads always see a consistent set of values
+    """
+    page_url: str
+    cookies: Mapping[str, str]
+    csrf_token: Optional[str] = None
+    session_id: Optional[str] = None
+    captured_at: float = field(default_factory=time.time)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'cookies', MappingProxyType(dict(self.cookies)))
+
+    @classmethod
+    def capture(cls, driver) -> 'SessionContext':
+        """
+        Read the session from the browser
+        The page source is only fetched if the meta tags and cookies do not already
+        carry the tokens, and then only once for both lookups
+        """
+        page_url = driver.current_url
+        cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+
+        csrf_token = cls._meta_csrf_token(driver)
+        session_id = next((cookies[name] for name in SESSION_COOKIES if name in cookies), None)
+
+        if not csrf_token or not session_id:
+            tokens = cls._page_tokens(driver)
+            if not csrf_token:
+                csrf_token = next((tokens[key] for key in CSRF_KEYS if key in tokens), None)
+            if not session_id:
+                session_id = next((tokens[key] for key in SESSION_KEYS if key in tokens), None)
+
+        if not csrf_token:
+            query_params = parse_qs(urlparse(page_url).query)
+            csrf_token = next((query_params[name][0] for name in CSRF_URL_PARAMS if name in query_params), None)
+
+        if not csrf_token:
+            logger.warning("CSRF token not found")
+
+        return cls(page_url=page_url, cookies=cookies, csrf_token=csrf_token, session_id=session_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "page_url": self.page_url,
+            "cookies": dict(self.cookies),
+            "csrf_token": self.csrf_token,
+            "session_id": self.session_id,
+            "captured_at": self.captured_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionContext':
+        return cls(
+            page_url=data["page_url"],
+            cookies=data["cookies"],
+            csrf_token=data.get("csrf_token"),
+            session_id=data.get("session_id"),
+            captured_at=data.get("captured_at", time.time())
+        )
+
+    def with_csrf_token(self, csrf_token: str) -> 'SessionContext':
+        """Return a copy carrying a refreshed CSRF token"""
+        return replace(self, csrf_token=csrf_token, captured_at=time.time())
+
+    @staticmethod
+    def _meta_csrf_token(driver) -> Optional[str]:
+        """CSRF token from the page's meta tags, if present"""
+        try:
+            csrf_elements = driver.find_elements("css selector", "meta[name='_csrf'], meta[name='csrf-token']")
+            if csrf_elements:
+                return csrf_elements[0].get_attribute("content")
+        except Exception as e:
+            logger.error(f"Error reading CSRF meta tag: {str(e)}")
+        return None
+
+    @staticmethod
+    def _page_tokens(driver) -> Dict[str, str]:
+        """Scan the page source once for CSRF and session tokens"""
+        try:
+            return scan_page_tokens(driver.page_source)
+        except Exception as e:
+            logger.error(f"Error scanning page source for tokens: {str(e)}")
+            return {}
@@ -0,0 +1,271 @@
+"""
+SuccessFactors Session Pool
+Keeps logged-in scraper sessions alive between API requests so repeat calls skip Chrome startup and login
+"""
+
+import os
+import time
+import hashlib
+import hmac
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional, Any, Tuple, Iterator
+from successfactors_scraper import SuccessFactorsScraper
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLoginError(Exception):
+    """Raised when a new session cannot be established; carries the HTTP status to report"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class PooledSession:
+    """
+    A logged-in scraper together with the extractor holding its captured cookies
+    """
+
+    def __init__(self, key: Tuple[str, str], password_digest: bytes, scraper: SuccessFactorsScraper):
+        self.key = key
+        self.password_digest = password_digest
+        self.scraper = scraper
+        self.extractor = scraper.extract_data()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.last_validated = self.created_at
+        # Set when the session is dropped from the pool while still serving a request
+        self.retired = False
+        # Serializes use of the single browser tab behind this session
+        self.lock = threading.Lock()
+
+    def close(self):
+        """Quit the browser behind this session"""
+        self.scraper.close()
+
+
+class SessionPool:
+    """
+    Pool of authenticated SuccessFactors sessions keyed by (company_id, username)
+    """
+
+    def __init__(self, max_size: Optional[int] = None, idle_timeout: Optional[float] = None,
+                 validate_interval: Optional[float] = None, scraper_factory=SuccessFactorsScraper):
+        """Initialize the pool; limits default to the SESSION_POOL_* environment variables"""
+        self.max_size = max_size or int(os.getenv('SESSION_POOL_MAX_SIZE', '4'))
+        self.idle_timeout = idle_timeout or float(os.getenv('SESSION_POOL_IDLE_TIMEOUT', '900'))
+        self.validate_interval = validate_interval or float(os.getenv('SESSION_POOL_VALIDATE_INTERVAL', '60'))
+        self.scraper_factory = scraper_factory
+
+        self._sessions: Dict[Tuple[str, str], PooledSession] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def acquire(self, company_id: str, username: str, password: str) -> Iterator[PooledSession]:
+        """
+        Borrow a logged-in session, reusing a pooled one when the credentials match
+        Raises SessionLoginError if a new login is needed and fails
+        """
+        self.evict_idle()
+
+        key = (company_id, username)
+        digest = self._digest(company_id, username, password)
+
+        with self._lock:
+            session = self._sessions.get(key)
+
+        # Never hand a pooled session to a caller that did not present the same password
+        if session and not hmac.compare_digest(session.password_digest, digest):
+            logger.info(f"Password mismatch for pooled session {company_id}/{username}, logging in again")
+            session = None
+
+        if session:
+            session.lock.acquire()
+            with self._lock:
+                still_pooled = self._sessions.get(key) is session
+            if not still_pooled:
+                # Evicted or replaced while we waited for it
+                session.lock.release()
+                session = None
+            elif not self._is_alive(session):
+                logger.info(f"Pooled session {company_id}/{username} expired, logging in again")
+                session.lock.release()
+                self._discard(session)
+                session = None
+
+        pooled = True
+        if not session:
+            session = self._login(key, digest, password)
+            session.lock.acquire()
+            pooled = self._add(session)
+
+        try:
+            session.last_used = time.time()
+            yield session
+        finally:
+            session.last_used = time.time()
+            session.lock.release()
+            if not pooled or session.retired:
+                session.close()
+
+    def evict_idle(self):
+        """Close sessions that have not been used within the idle timeout"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                session for session in self._sessions.values()
+                if now - session.last_used > self.idle_timeout and not session.lock.locked()
+            ]
+            for session in expired:
+                del self._sessions[session.key]
+
+        for session in expired:
+            logger.info(f"Evicting idle session {session.key[0]}/{session.key[1]}")
+            session.close()
+
+    def health(self, validate: bool = False) -> Dict[str, Any]:
+        """
+        Report pool occupancy and, optionally, whether each idle session still authenticates
+        """
+        now = time.time()
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        entries = []
+        for session in sessions:
+            entry = {
+                "company_id": session.key[0],
+                "username": session.key[1],
+                "age_seconds": round(now - session.created_at, 1),
+                "idle_seconds": round(now - session.last_used, 1),
+                "in_use": session.lock.locked()
+            }
+            if validate and session.lock.acquire(blocking=False):
+                try:
+                    entry["valid"] = session.extractor.is_session_valid()
+                    if entry["valid"]:
+                        session.last_validated = time.time()
+                finally:
+                    session.lock.release()
+            entries.append(entry)
+
+        return {
+            "size": len(sessions),
+            "max_size": self.max_size,
+            "idle_timeout": self.idle_timeout,
+            "sessions": entries
+        }
+
+    def start_reaper(self, interval: float = 60):
+        """Start a background thread that evicts idle sessions periodically"""
+        if self._reaper and self._reaper.is_alive():
+            return
+
+        def reap():
+            while not self._stop.wait(interval):
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    logger.error(f"Error evicting idle sessions: {str(e)}")
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=reap, name="session-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def close_all(self):
+        """Stop the reaper and close every pooled session"""
+        self._stop.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+        logger.info(f"Closed {len(sessions)} pooled sessions")
+
+    def _login(self, key: Tuple[str, str], digest: bytes, password: str) -> PooledSession:
+        """Start a browser, log in and capture the session cookies"""
+        company_id, username = key
+        logger.info(f"Creating new session for {company_id}/{username}")
+
+        scraper = self.scraper_factory(username=username, password=password, company_id=company_id)
+        try:
+            scraper.setup_driver()
+
+            if not scraper.navigate_to_login():
+                raise SessionLoginError(400, "Failed to navigate to SuccessFactors")
+
+            if not scraper.login():
+                raise SessionLoginError(401, "Login failed")
+
+            session = PooledSession(key, digest, scraper)
+            if not session.extractor.extract_session_data():
+                raise SessionLoginError(500, "Failed to create data extractor")
+            return session
+
+        except Exception:
+            scraper.close()
+            raise
+
+    def _is_alive(self, session: PooledSession) -> bool:
+        """Validate the session with a cheap request, at most once per validate interval"""
+        if time.time() - session.last_validated < self.validate_interval:
+            return True
+
+        if session.extractor.is_session_valid():
+            session.last_validated = time.time()
+            return True
+        return False
+
+    def _add(self, session: PooledSession) -> bool:
+        """
+        Add a new session to the pool, evicting the least recently used idle one if full
+        Returns False if every pooled session is busy and the new one cannot be kept
+        """
+        evicted = []
+        with self._lock:
+            previous = self._sessions.pop(session.key, None)
+            if previous:
+                evicted.append(previous)
+
+            while len(self._sessions) >= self.max_size:
+                idle = [s for s in self._sessions.values() if not s.lock.locked()]
+                if not idle:
+                    break
+                oldest = min(idle, key=lambda s: s.last_used)
+                del self._sessions[oldest.key]
+                evicted.append(oldest)
+
+            added = len(self._sessions) < self.max_size
+            if added:
+                self._sessions[session.key] = session
+
+        for old in evicted:
+            # A replaced session may still be serving a request; its borrower closes it then
+            if old.lock.acquire(blocking=False):
+                old.lock.release()
+                old.close()
+            else:
+                old.retired = True
+
+        if not added:
+            logger.warning("Session pool is full of busy sessions, using an unpooled session")
+        return added
+
+    def _discard(self, session: PooledSession):
+        """Remove a session from the pool and close it"""
+        with self._lock:
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+        session.close()
+
+    @staticmethod
+    def _digest(company_id: str, username: str, password: str) -> bytes:
+        """Hash the credentials so a pooled session is only reused by callers presenting the same password"""
+        return hashlib.sha256(f"{company_id}\0{username}\0{password}".encode('utf-8')).digest()
@@ -0,0 +1,112 @@
+"""
+Encrypted Session Store
+Keeps captured session contexts on disk, encrypted, so repeat CLI runs can skip the browser login
+"""
+
+import os
+import json
+import base64
+import hashlib
+import logging
+from typing import Optional
+from session_context import SessionContext
+
+logger = logging.getLogger(__name__)
+
+# cryptography is optional; without it sessions are never written to disk
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:
+    Fernet = None
+
+KDF_ITERATIONS = 200_000
+
+
+class SessionStore:
+    """
+    One encrypted file per (company_id, username) holding the last captured SessionContext
+    The encryption key is derived from the user's password, plus SESSION_STORE_KEY if
+    set, so a cached session can only be read back by a caller presenting the same password
+    """
+
+    def __init__(self, store_dir: Optional[str] = None, max_age: Optional[float] = None):
+        """Open the store; settings default to SESSION_STORE_DIR and SESSION_STORE_MAX_AGE"""
+        self.store_dir = store_dir or os.getenv('SESSION_STORE_DIR', '.session_store')
+        self.max_age = max_age or float(os.getenv('SESSION_STORE_MAX_AGE', '28800'))
+        self.secret = os.getenv('SESSION_STORE_KEY', '')
+        self.enabled = Fernet is not None
+        if not self.enabled:
+            logger.info("cryptography is not installed, session store disabled")
+
+    def load(self, company_id: str, username: str, password: str) -> Optional[SessionContext]:
+        """Return the cached session context, or None if missing, expired or unreadable"""
+        if not self.enabled:
+            return None
+
+        path = self._path(company_id, username)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+
+            salt = base64.b64decode(stored["salt"])
+            fernet = Fernet(self._derive_key(password, salt))
+            payload = json.loads(fernet.decrypt(stored["token"].encode('ascii'), ttl=int(self.max_age)))
+            return SessionContext.from_dict(payload)
+
+        except FileNotFoundError:
+            return None
+        except InvalidToken:
+            # Wrong password or expired entry; it will be overwritten after the next login
+            logger.info(f"Cached session for {company_id}/{username} is expired or was saved with other credentials")
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cached session {path}: {str(e)}")
+            return None
+
+    def save(self, company_id: str, username: str, password: str, context: SessionContext):
+        """Encrypt and write the session context, readable only by the current user"""
+        if not self.enabled or context is None:
+            return
+
+        try:
+            salt = os.urandom(16)
+            fernet = Fernet(self._derive_key(password, salt))
+            token = fernet.encrypt(json.dumps(context.to_dict()).encode('utf-8'))
+            stored = {
+                "version": 1,
+                "salt": base64.b64encode(salt).decode('ascii'),
+                "token": token.decode('ascii')
+            }
+
+            os.makedirs(self.store_dir, mode=0o700, exist_ok=True)
+            path = self._path(company_id, username)
+            tmp_path = f"{path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, path)
+            logger.info(f"Session for {company_id}/{username} cached to {path}")
+
+        except Exception as e:
+            logger.error(f"Error caching session: {str(e)}")
+
+    def delete(self, company_id: str, username: str):
+        """Forget the cached session, e.g. after it failed validation"""
+        try:
+            os.remove(self._path(company_id, username))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error deleting cached session: {str(e)}")
+
+    def _path(self, company_id: str, username: str) -> str:
+        """File name derived from a hash so usernames do not appear on disk"""
+        name = hashlib.sha256(f"{company_id}\0{username}".encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.store_dir, f"{name}.session")
+
+    def _derive_key(self, password: str, salt: bytes) -> bytes:
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+        material = f"{password}\0{self.secret}".encode('utf-8')
+        return base64.urlsafe_b64encode(kdf.derive(material))
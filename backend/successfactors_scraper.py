@@ -4,23 +4,26 @@ A Selenium-based scraper for SuccessFactors login and data extraction
 """
 
 import os
+import json
 import time
 import logging
 import traceback
-from typing import Optional, Dict, Any, List
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Set
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import (
     TimeoutException,
     NoSuchElementException,
     WebDriverException
 )
-from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
+from driver_factory import create_driver, resource_blocker, origin_of
+from models import ROLE_PERMISSIONS_EXPAND
+from request_governor import governor
+from telemetry import timed
 
 # Load environment variables
 load_dotenv()
@@ -43,11 +46,37 @@ class SuccessFactorsScraper:
     A Selenium WebDriver-based scraper for SuccessFactors
     """
 
-    def __init__(self, username=None, password=None, company_id=None):
-        """Initialize the SuccessFactors scraper"""
+    # Role list fields in column order, with the data-testid of each cell
+    ROLE_CELL_TEST_IDS = {
+        'id': 'rolelist-table-cell-role-id',
+        'name': 'rolelist-table-cell-name',
+        'user_type': 'rolelist-table-cell-user-type',
+        'description': 'rolelist-table-cell-description',
+        'status': 'rolelist-table-cell-status',
+        'rbp_only': 'rolelist-table-cell-rbp-only',
+        'last_modified': 'rolelist-table-cell-last-modified',
+        'actions': 'rolelist-table-cell-actions'
+    }
+
+    # Cell selectors tried in order when reading a row positionally
+    ROLE_CELL_SELECTORS = [
+        "ui5-table-cell",
+        "td",
+        "[role='cell']",
+        "[data-testid*='cell']",
+        ".sapMText",
+        ".sapMLabel"
+    ]
+
+    def __init__(self, username=None, password=None, company_id=None, driver_pool=None, base_url=None):
+        """Initialize the SuccessFactors scraper; with a driver_pool the browser is borrowed from it"""
         self.driver: Optional[webdriver.Chrome] = None
+        self.driver_pool = driver_pool
+
+        # Optional request limiter passed on to the extractors this scraper creates
+        self.rate_limiter = None
         self.wait: Optional[WebDriverWait] = None
-        self.base_url = "https://salesdemo.successfactors.eu"
+        self.base_url = base_url or "https://salesdemo.successfactors.eu"
         
         # Configuration - use parameters or environment variables
         self.username = username or os.getenv('SF_USERNAME', '')
@@ -56,33 +85,27 @@ class SuccessFactorsScraper:
         self.headless = os.getenv('HEADLESS', 'False').lower() == 'true'
         self.implicit_wait = int(os.getenv('IMPLICIT_WAIT', '10'))
         self.page_load_timeout = int(os.getenv('PAGE_LOAD_TIMEOUT', '30'))
+        self.role_table_timeout = float(os.getenv('ROLE_TABLE_TIMEOUT', '30'))
+        self.role_table_quiet_period = float(os.getenv('ROLE_TABLE_QUIET_PERIOD', '1.0'))
+
+        # Request counters accumulated across page loads when resource blocking is enabled
+        self.network_stats: Dict[str, Any] = {}
+
+        # Origins this browser has loaded, so a pooled browser has their storage cleared on release
+        self.visited_origins: Set[str] = set()
 
         logger.info("SuccessFactors scraper initialized")
 
+    @timed("driver_setup")
     def setup_driver(self) -> None:
         """Setup Chrome WebDriver with appropriate options"""
         try:
-            chrome_options = Options()
-
-            if self.headless:
-                chrome_options.add_argument('--headless')
-
-            # Performance optimizations for faster loading
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--disable-extensions')
-            chrome_options.add_argument('--disable-plugins')
-            chrome_options.add_argument('--disable-background-networking')
-            chrome_options.add_argument('--disable-sync')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-
-            # Setup Chrome service with faster options
-            service = Service(ChromeDriverManager().install())
-
-            # Initialize WebDriver
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            # Borrow a warm browser when pooled, otherwise launch one with the shared chromedriver
+            if self.driver_pool:
+                self.driver = self.driver_pool.acquire()
+            else:
+                self.driver = create_driver(self.headless)
+
             self.driver.implicitly_wait(self.implicit_wait)
             self.driver.set_page_load_timeout(self.page_load_timeout)
 
@@ -95,10 +118,12 @@ class SuccessFactorsScraper:
             logger.error(f"Failed to setup WebDriver: {str(e)}")
             raise
 
+    @timed("navigation")
     def navigate_to_login(self) -> bool:
         """Navigate to the SuccessFactors login page"""
         try:
             logger.info(f"Navigating to {self.base_url}")
+            self.visited_origins.add(origin_of(self.base_url))
             self.driver.get(self.base_url)
 
             # Wait for page to load
@@ -106,6 +131,7 @@ class SuccessFactorsScraper:
                 (By.TAG_NAME, "body")))
 
             logger.info("Successfully navigated to SuccessFactors")
+            self.log_network_stats("login page load")
             return True
 
         except TimeoutException:
@@ -115,6 +141,7 @@ class SuccessFactorsScraper:
             logger.error(f"Error navigating to SuccessFactors: {str(e)}")
             return False
 
+    @timed("company_entry")
     def handle_company_entry(self) -> bool:
         """
         Handle the company entry page (first step in SuccessFactors login)
@@ -174,10 +201,12 @@ class SuccessFactorsScraper:
             logger.error(f"Error handling company entry: {str(e)}")
             return False
 
+    @timed("login")
     def login(self) -> bool:
         """
         Perform login to SuccessFactors
         Returns True if login is successful, False otherwise
+        The login stage includes the company entry stage it starts with
         """
         try:
             if not self.username or not self.password:
@@ -297,9 +326,12 @@ class SuccessFactorsScraper:
 
                 # Quick check for successful login (no delay needed)
                 current_url = self.driver.current_url
+                # Logins may redirect to another data centre's host
+                self.visited_origins.add(origin_of(current_url))
                 if "login" not in current_url.lower() and "error" not in current_url.lower():
                     logger.info(
                         f"Login successful! Redirected to: {current_url}")
+                    self.log_network_stats("login")
                     return True
                 else:
                     logger.error(
@@ -319,6 +351,7 @@ class SuccessFactorsScraper:
         from data_extractor import SuccessFactorsDataExtractor
         return SuccessFactorsDataExtractor(self)
 
+    @timed("role_list")
     def extract_roles_data(self) -> List[Dict[str, Any]]:
         """
         Extract role data from the UI table at /sf/authz#/roleList
@@ -326,99 +359,154 @@ class SuccessFactorsScraper:
         """
         try:
             logger.info("Navigating to role list page...")
+            timings = {}
+            extraction_start = time.monotonic()
             
             # Navigate to the role list page
             role_url = f"{self.base_url}/sf/authz#/roleList"
             self.driver.get(role_url)
+            timings['navigate'] = time.monotonic() - extraction_start
             
-            # Wait for the page to load
-            time.sleep(5)
-            
-            # Debug: Take screenshot and log current URL
             logger.info(f"Current URL after navigation: {self.driver.current_url}")
-            screenshot_path = self.take_screenshot("role_page_debug.png")
-            logger.info(f"Debug screenshot saved: {screenshot_path}")
-            
-            # Log page title and some source
-            logger.info(f"Page title: {self.driver.title}")
-            page_source = self.driver.page_source
-            logger.info(f"Page source length: {len(page_source)}")
             
-            # Check if table exists with different selectors
-            table_found = False
-            working_table_selector = None
-            table_selectors = [
-                "ui5-table[id='rolelist-table']",
-                "ui5-table",
-                "[role='table']",
-                "table",
-                ".sapMList",
-                ".sapMTable",
-                "[data-sap-ui-table]",
-                "[class*='table']"
+            # Candidate tables, most specific first, with the row selectors that fit each
+            ui5_row_selectors = ["ui5-table-row", "ui5-table-row-base", "[role='row']"]
+            html_row_selectors = ["tr", "[role='row']", ".sapMListItem", ".sapMTableRow"]
+            table_candidates = [
+                ("ui5-table[id='rolelist-table']", ui5_row_selectors),
+                ("ui5-table", ui5_row_selectors),
+                ("[role='table']", html_row_selectors),
+                ("table", html_row_selectors),
+                (".sapMList", html_row_selectors),
+                (".sapMTable", html_row_selectors),
+                ("[data-sap-ui-table]", html_row_selectors),
+                ("[class*='table']", html_row_selectors)
             ]
             
-            for selector in table_selectors:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        logger.info(f"Found {len(elements)} elements with selector '{selector}'")
-                        table_found = True
-                        working_table_selector = selector
-                        break
-                except Exception as e:
-                    logger.debug(f"Selector '{selector}' failed: {str(e)}")
+            # Wait until the table has rendered rows and the row count has settled
+            step_start = time.monotonic()
+            readiness = self.wait_for_table_ready(table_candidates)
+            timings['table_ready'] = time.monotonic() - step_start
+            self.log_network_stats("role list load")
             
-            if not table_found:
+            if not readiness:
                 logger.warning("No table elements found with any selector")
-                # Save page source for debugging
+                # Save screenshot and page source for debugging
+                screenshot_path = self.take_screenshot("role_page_debug.png")
+                logger.info(f"Debug screenshot saved: {screenshot_path}")
                 try:
                     with open("role_page_source.html", 'w', encoding='utf-8') as f:
-                        f.write(page_source)
+                        f.write(self.driver.page_source)
                     logger.info("Page source saved to role_page_source.html")
                 except Exception as save_error:
                     logger.warning(f"Could not save page source: {str(save_error)}")
+                self._log_timings("Role list", timings, extraction_start)
                 return []
             
-            # Wait for the page to load and table to be present
-            logger.info(f"Waiting for role list table to load using selector: {working_table_selector}")
-            try:
-                # Try the working selector first
-                self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, working_table_selector)))
-            except TimeoutException:
-                logger.warning(f"Timeout waiting for '{working_table_selector}', trying fallback approach")
-                # Wait a bit more and continue anyway
-                time.sleep(3)
-            
-            # Additional wait for dynamic content to load
-            time.sleep(3)
-            
-            # Try different row selectors based on what table type we found
-            row_selectors = []
-            if "ui5-table" in working_table_selector:
-                row_selectors = ["ui5-table-row", "ui5-table-row-base", "[role='row']"]
-            else:
-                row_selectors = ["tr", "[role='row']", ".sapMListItem", ".sapMTableRow"]
-            
-            # Find all table rows
-            table_rows = []
-            for row_selector in row_selectors:
-                try:
-                    table_rows = self.driver.find_elements(By.CSS_SELECTOR, row_selector)
-                    if table_rows:
-                        logger.info(f"Found {len(table_rows)} rows using selector: {row_selector}")
-                        break
-                except Exception as e:
-                    logger.debug(f"Row selector '{row_selector}' failed: {str(e)}")
+            working_table_selector, row_selector, row_count = readiness
+            logger.info(f"Role list table ready using selector '{working_table_selector}' "
+                        f"with {row_count} rows matching '{row_selector}'")
             
-            if not table_rows:
+            if not row_selector:
                 logger.warning("No table rows found with any selector")
+                self._log_timings("Role list", timings, extraction_start)
                 return []
             
-            logger.info(f"Found {len(table_rows)} table rows")
+            # Serialize the whole table in the browser with one round trip
+            step_start = time.monotonic()
+            roles_data = self._extract_role_rows_js(row_selector)
+            
+            if roles_data is None:
+                logger.info("Falling back to per-cell role extraction")
+                table_rows = self.driver.find_elements(By.CSS_SELECTOR, row_selector)
+                roles_data = self._extract_role_rows_webdriver(table_rows)
             
-            roles_data = []
+            timings['extract_rows'] = time.monotonic() - step_start
             
+            logger.info(f"Successfully extracted {len(roles_data)} roles")
+            self._log_timings("Role list", timings, extraction_start)
+            return roles_data
+            
+        except Exception as e:
+            logger.error(f"Error extracting roles data: {str(e)}")
+            import traceback
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            return []
+
+    def _extract_role_rows_js(self, row_selector: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extract every role row with a single execute_script call
+        Mirrors the per-cell fallback (positional cells, then data-testid cells, then row text)
+        and returns None if the script fails so the caller can fall back
+        """
+        script = """
+        var rows = document.querySelectorAll(arguments[0]);
+        var cellSelectors = arguments[1];
+        var fields = arguments[2];
+        var testIds = arguments[3];
+
+        function text(el) {
+          return el ? (el.innerText || el.textContent || "").trim() : "";
+        }
+        function hasValue(role) {
+          return fields.some(function(f) { return role[f]; });
+        }
+
+        var roles = [];
+        for (var r = 0; r < rows.length; r++) {
+          var row = rows[r];
+          var role = {};
+
+          var cells = [];
+          for (var c = 0; c < cellSelectors.length; c++) {
+            cells = row.querySelectorAll(cellSelectors[c]);
+            if (cells.length) break;
+          }
+          if (cells.length >= 3) {
+            fields.forEach(function(f, i) { role[f] = i < cells.length ? text(cells[i]) : ""; });
+          }
+
+          if (!hasValue(role)) {
+            fields.forEach(function(f) {
+              role[f] = text(row.querySelector("[data-testid='" + testIds[f] + "']"));
+            });
+          }
+
+          if (!hasValue(role)) {
+            var parts = text(row).split("\\n").map(function(p) { return p.trim(); }).filter(Boolean);
+            fields.forEach(function(f, i) { role[f] = f === "actions" ? "" : (parts[i] || ""); });
+          }
+
+          if (role.id || role.name) roles.push(role);
+        }
+        return JSON.stringify(roles);
+        """
+        
+        try:
+            result = self.driver.execute_script(
+                script,
+                row_selector,
+                self.ROLE_CELL_SELECTORS,
+                list(self.ROLE_CELL_TEST_IDS.keys()),
+                self.ROLE_CELL_TEST_IDS
+            )
+            roles_data = json.loads(result)
+            logger.info(f"Extracted {len(roles_data)} role rows in a single script call")
+            return roles_data
+        except Exception as e:
+            logger.warning(f"Single-call role extraction failed: {str(e)}")
+            return None
+    
+    def _extract_role_rows_webdriver(self, table_rows) -> List[Dict[str, Any]]:
+        """
+        Extract role rows one WebDriver call at a time
+        Slow fallback for when the single-call JavaScript extraction fails
+        """
+        roles_data = []
+        
+        # Missing cells are expected here, so do not let the implicit wait stall on each one
+        self.driver.implicitly_wait(0)
+        try:
             for row_idx, row in enumerate(table_rows):
                 try:
                     # Extract data from each cell using multiple approaches
@@ -426,16 +514,7 @@ class SuccessFactorsScraper:
                     
                     # Try to get all cell elements from the row
                     cells = []
-                    cell_selectors = [
-                        "ui5-table-cell",
-                        "td", 
-                        "[role='cell']",
-                        "[data-testid*='cell']",
-                        ".sapMText",
-                        ".sapMLabel"
-                    ]
-                    
-                    for cell_selector in cell_selectors:
+                    for cell_selector in self.ROLE_CELL_SELECTORS:
                         try:
                             cells = row.find_elements(By.CSS_SELECTOR, cell_selector)
                             if cells:
@@ -549,16 +628,79 @@ class SuccessFactorsScraper:
                 except Exception as e:
                     logger.warning(f"Error extracting data from row {row_idx + 1}: {str(e)}")
                     continue
+        finally:
+            self.driver.implicitly_wait(self.implicit_wait)
+        
+        return roles_data
+
+    def wait_for_table_ready(self, table_candidates, timeout: Optional[float] = None,
+                             quiet_period: Optional[float] = None, poll_interval: float = 0.1):
+        """
+        Wait until a table from table_candidates has rows and its row count stops changing
+        table_candidates is a list of (table_selector, row_selectors) tried in order.
+        Returns (table_selector, row_selector, row_count), with row_selector None if the
+        table never got rows, or None if no table appeared before the timeout
+        """
+        timeout = timeout or self.role_table_timeout
+        quiet_period = quiet_period if quiet_period is not None else self.role_table_quiet_period
+        
+        # One round trip per poll: find the first matching table and count its rows
+        script = """
+        var candidates = arguments[0];
+        for (var i = 0; i < candidates.length; i++) {
+          if (!document.querySelector(candidates[i][0])) continue;
+          var rowSelectors = candidates[i][1];
+          for (var j = 0; j < rowSelectors.length; j++) {
+            var count = document.querySelectorAll(rowSelectors[j]).length;
+            if (count > 0) return [candidates[i][0], rowSelectors[j], count];
+          }
+          return [candidates[i][0], null, 0];
+        }
+        return null;
+        """
+        
+        deadline = time.monotonic() + timeout
+        last_state = None
+        stable_since = None
+        
+        while True:
+            now = time.monotonic()
+            try:
+                state = self.driver.execute_script(script, [[t, list(r)] for t, r in table_candidates])
+            except WebDriverException as e:
+                logger.debug(f"Table readiness probe failed: {str(e)}")
+                state = None
             
-            logger.info(f"Successfully extracted {len(roles_data)} roles")
-            return roles_data
+            if state != last_state:
+                last_state = state
+                stable_since = now
+            elif state and state[2] > 0 and now - stable_since >= quiet_period:
+                return tuple(state)
             
-        except Exception as e:
-            logger.error(f"Error extracting roles data: {str(e)}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            return []
-
+            if now >= deadline:
+                logger.warning(f"Timed out after {timeout}s waiting for table rows to settle")
+                return tuple(last_state) if last_state else None
+            
+            time.sleep(poll_interval)
+    
+    def log_network_stats(self, label: str) -> Dict[str, Any]:
+        """Add the requests made since the last call to network_stats and log the totals"""
+        if not resource_blocker.enabled or not self.driver:
+            return self.network_stats
+
+        before = self.network_stats.get("blocked_requests", 0)
+        resource_blocker.collect_stats(self.driver, self.network_stats)
+        logger.info(f"Network after {label}: {self.network_stats['blocked_requests'] - before} requests blocked, "
+                    f"totals {self.network_stats['requests']} requests, "
+                    f"{self.network_stats['blocked_requests']} blocked {self.network_stats['blocked_by_type']}, "
+                    f"{self.network_stats['transferred_bytes']} bytes transferred")
+        return self.network_stats
+    
+    def _log_timings(self, label: str, timings: Dict[str, float], start: float):
+        """Log per-step durations of a multi-step operation"""
+        steps = ", ".join(f"{name}={duration:.2f}s" for name, duration in timings.items())
+        logger.info(f"{label} timings: {steps}, total={time.monotonic() - start:.2f}s")
+    
     def fetch_role_permissions(self, role_id: str) -> Dict[str, Any]:
         """
         Fetch permissions for a specific role using OData API
@@ -569,7 +711,7 @@ class SuccessFactorsScraper:
             
             # OData service root
             service_root = f"{self.base_url}/odatav4/iam/authorization/PAP.svc/v1/"
-            permissions_url = f"{service_root}PermissionRoleEntity({role_id})?$expand=categories"
+            permissions_url = f"{service_root}PermissionRoleEntity({role_id})?$expand={ROLE_PERMISSIONS_EXPAND}"
             
             # Use JavaScript fetch via Selenium to leverage browser session
             script = """
@@ -587,16 +729,18 @@ class SuccessFactorsScraper:
             })
             .then(function(response) {
               if (!response.ok) {
-                throw new Error("HTTP " + response.status + " - " + response.statusText);
+                callback({success: false, status: response.status,
+                          retryAfter: response.headers.get("Retry-After"),
+                          error: "HTTP " + response.status + " - " + response.statusText});
+                return;
               }
-              return response.json();
-            })
-            .then(function(data) {
-              callback({success: true, data: data});
+              return response.json().then(function(data) {
+                callback({success: true, status: response.status, data: data});
+              });
             })
             .catch(function(error) {
               console.error("Fetch error:", error);
-              callback({success: false, error: error.message});
+              callback({success: false, status: 0, error: error.message});
             });
             """
             
@@ -605,7 +749,22 @@ class SuccessFactorsScraper:
             # Set script timeout for async execution
             self.driver.set_script_timeout(30)
             
-            result = self.driver.execute_async_script(script, permissions_url)
+            def attempt():
+                # Batch runs share one per-host rate across tenant processes; the browser fetch counts too
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                # Shape the script result like a response so the governor can retry throttled calls
+                outcome = self.driver.execute_async_script(script, permissions_url) or {}
+                if not outcome.get('status'):
+                    # fetch() itself failed, e.g. a dropped connection
+                    raise ConnectionError(outcome.get('error', 'No result returned'))
+                return SimpleNamespace(
+                    status_code=outcome.get('status') or 0,
+                    headers={"Retry-After": outcome.get('retryAfter')} if outcome.get('retryAfter') else {},
+                    result=outcome
+                )
+            
+            result = governor.execute("GET", permissions_url, attempt).result
             
             if result and result.get('success'):
                 logger.info(f"Successfully fetched permissions for role {role_id}")
@@ -719,9 +878,13 @@ class SuccessFactorsScraper:
     def close(self) -> None:
         """Close the WebDriver and clean up resources"""
         try:
-            if self.driver:
+            if self.driver and self.driver_pool:
+                self.driver_pool.release(self.driver, self.visited_origins)
+                logger.info("WebDriver returned to the pool")
+            elif self.driver:
                 self.driver.quit()
                 logger.info("WebDriver closed successfully")
+            self.driver = None
         except Exception as e:
             logger.error(f"Error closing WebDriver: {str(e)}")
 
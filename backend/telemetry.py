@@ -0,0 +1,235 @@
+"""
+Scraper Telemetry
+Timing spans, histograms and counters for every scraper stage, exported in the Prometheus text format
+"""
+
+import time
+import bisect
+import logging
+import functools
+import threading
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for a 5 ms DWR call and a 60 s browser login
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families read at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.label_names, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set"""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Count and total seconds per label set"""
+        with self._lock:
+            return {key: {"count": series[2], "total_seconds": round(series[1], 3)}
+                    for key, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for key, (bucket_counts, total, count) in series_items:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics owned by this process plus collectors that report other components' state when scraped"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, label_names, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Add a callable whose metric families are read on every scrape"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+class Span:
+    """
+    Times one stage and records it in the stage histogram when it ends
+    The outcome is "error" if the block raised; call fail() to mark a handled failure
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "ok"
+        self.duration: Optional[float] = None
+        self._start = 0.0
+
+    def fail(self):
+        self.outcome = "failed"
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.outcome = "error"
+        STAGE_SECONDS.observe(self.duration, stage=self.stage, outcome=self.outcome)
+        logger.debug(f"Stage {self.stage} took {self.duration:.3f}s ({self.outcome})")
+        return False
+
+
+def span(stage: str) -> Span:
+    """Time a block as one stage: with span("login") as s: ..."""
+    return Span(stage)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function as one stage; a False return counts as failed"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(stage) as current:
+                result = func(*args, **kwargs)
+                if result is False:
+                    current.fail()
+                return result
+        return wrapper
+    return decorator
+
+
+def stage_summary() -> Dict[str, Dict[str, float]]:
+    """Calls and total seconds per stage recorded in this process, e.g. for a run summary"""
+    stages: Dict[str, Dict[str, float]] = {}
+    for (stage, _outcome), stats in STAGE_SECONDS.summary().items():
+        totals = stages.setdefault(stage, {"count": 0, "total_seconds": 0.0})
+        totals["count"] += stats["count"]
+        totals["total_seconds"] = round(totals["total_seconds"] + stats["total_seconds"], 3)
+    return dict(sorted(stages.items()))
+
+
+def _label_key(label_names: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in label_names)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "sf_stage_duration_seconds",
+    "Duration of scraper stages: driver setup, navigation, company entry, login, session extraction, serialization",
+    ["stage", "outcome"]
+)
+REQUEST_SECONDS = registry.histogram(
+    "sf_request_duration_seconds",
+    "Duration of each DWR and OData request attempt to SuccessFactors",
+    ["method", "endpoint", "status"]
+)
+REQUEST_EVENTS = registry.counter(
+    "sf_request_events_total",
+    "Request governor events: retries, throttled responses and circuit rejections",
+    ["method", "endpoint", "event"]
+)